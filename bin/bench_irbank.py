@@ -0,0 +1,295 @@
+"""
+Benchmark the single-pass IRBANK extractor (lib.irbank.parse_results_page)
+against the original per-section regex parsers, and check both give the same
+dividend rows and year_loss.
+
+The regex parsers below are the unmodified pre-extractor code of lib/irbank.py,
+kept here as the reference. The extractor decodes entities (e.g. &minus;),
+which the regexes leave in place, so a page using them can legitimately
+differ; such pages are listed as mismatches for inspection.
+
+The corpus is every IRBANK 決算まとめ page in the HTTP response cache
+(expired entries included), or the *.html files of --dir. With neither,
+--synthetic pages shaped like 決算まとめ are generated.
+
+Usage:
+    python bin/bench_irbank.py
+    python bin/bench_irbank.py --dir saved_pages/ --repeat 5
+    python bin/bench_irbank.py --synthetic 200
+"""
+
+import argparse
+import glob
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from lib.http_cache import CACHE_PATH
+from lib.irbank import parse_results_page, year_loss_from_pl_rows
+
+
+# --- reference: regex parsers as they were before parse_results_page ---------
+
+def _strip_tags(fragment: str) -> str:
+    return re.sub(r"<[^>]+>", "", fragment).strip()
+
+
+def _parse_dividend_tbody_after_c_dividend(html: str) -> list[tuple[int, float | None]]:
+    """
+    Parse fiscal years and per-share dividend (yen) from IRBANK 配当 table.
+    Returns list of (fiscal_start_year, dps_or_none) e.g. (2010, 5.0), (2009, None).
+    """
+    m = re.search(r'id="c_dividend"[^>]*>.*?</h2>\s*<div>\s*<table[^>]*>.*?<tbody>(.*?)</tbody>', html, re.DOTALL | re.IGNORECASE)
+    if not m:
+        return []
+    tbody = m.group(1)
+    rows: list[tuple[int, float | None]] = []
+    for tr in re.finditer(r"<tr[^>]*>(.*?)</tr>", tbody, re.DOTALL | re.IGNORECASE):
+        row = tr.group(1)
+        tds = re.findall(r"<td[^>]*>(.*?)</td>", row, re.DOTALL | re.IGNORECASE)
+        if len(tds) < 2:
+            continue
+        fy_cell = _strip_tags(tds[0])
+        if "予" in fy_cell:
+            continue
+        fy_m = re.search(r"(\d{4}/\d{2})", fy_cell)
+        if not fy_m:
+            continue
+        year = int(fy_m.group(1).split("/")[0])
+        dps_cell = tds[1]
+        dps_plain = _strip_tags(dps_cell)
+        if dps_plain in ("-", "−", "", "—"):
+            rows.append((year, None))
+            continue
+        try:
+            dps = float(dps_plain.replace(",", ""))
+        except ValueError:
+            rows.append((year, None))
+            continue
+        rows.append((year, dps))
+    return rows
+
+
+def _pl_thead_first_row(html_fragment: str) -> str | None:
+    m = re.search(r"<thead[^>]*>\s*<tr[^>]*>(.*?)</tr>", html_fragment, re.DOTALL | re.IGNORECASE)
+    return m.group(1) if m else None
+
+
+def _pl_net_income_column_index(html: str) -> int | None:
+    m = re.search(
+        r'id="c_pl"[^>]*>.*?</h2>\s*<div>\s*<table[^>]*>(.*?)</table>',
+        html,
+        re.DOTALL | re.IGNORECASE,
+    )
+    if not m:
+        return None
+    thead_row = _pl_thead_first_row(m.group(1))
+    if not thead_row:
+        return None
+    ths = re.findall(r"<th[^>]*>(.*?)</th>", thead_row, re.DOTALL | re.IGNORECASE)
+    for i, th_html in enumerate(ths):
+        if _th_is_net_income_pl_column(th_html):
+            return i
+    return None
+
+
+def _th_is_net_income_pl_column(th_html: str) -> bool:
+    """True if this <th> is net income for the 会社業績 table (IRBANK label varies by issuer)."""
+    title_m = re.search(r'title="([^"]*)"', th_html, re.IGNORECASE)
+    title = (title_m.group(1) if title_m else "").strip()
+    text = _strip_tags(th_html).strip()
+    if "当期利益" in text or "当期利益" in title:
+        return True
+    if "当期純利益" in text or "当期純利益" in title:
+        return True
+    if text == "純利" or title == "純利":
+        return True
+    return False
+
+
+def _pl_cell_is_loss(plain: str) -> bool:
+    """True when IRBANK 会社業績 net income cell indicates a loss for that fiscal year."""
+    plain = plain.strip()
+    if not plain or plain in ("-", "−", "", "—"):
+        return False
+    if "赤字" in plain:
+        return True
+    s = plain.replace(",", "").replace(" ", "")
+    if re.search(r"△\s*\d", s):
+        return True
+    m_oku = re.search(r"(-?\d+\.?\d*)\s*億", s)
+    if m_oku:
+        return float(m_oku.group(1)) < 0
+    s2 = (
+        s.replace("−", "-")
+        .replace("△", "-")
+    )
+    try:
+        v = float(re.sub(r"[^\d.\-]", "", s2))
+        return v < 0
+    except ValueError:
+        return False
+
+
+def _parse_year_loss_from_pl(html: str) -> int | None:
+    """
+    Latest fiscal start-year with a loss in 会社業績 net income column (当期利益 / 純利 / 当期純利益).
+
+    Returns:
+        int: max loss year (fiscal label YYYY/MM -> YYYY)
+        0: table and column found, no loss rows
+        None: section/column missing or no parseable body rows
+    """
+    col_idx = _pl_net_income_column_index(html)
+    if col_idx is None:
+        return None
+    m = re.search(
+        r'id="c_pl"[^>]*>.*?</h2>\s*<div>\s*<table[^>]*>.*?<tbody>(.*?)</tbody>',
+        html,
+        re.DOTALL | re.IGNORECASE,
+    )
+    if not m:
+        return None
+    tbody = m.group(1)
+    loss_years: list[int] = []
+    saw_fy_row = False
+    for tr in re.finditer(r"<tr[^>]*>(.*?)</tr>", tbody, re.DOTALL | re.IGNORECASE):
+        row = tr.group(1)
+        tds = re.findall(r"<td[^>]*>(.*?)</td>", row, re.DOTALL | re.IGNORECASE)
+        if not tds:
+            continue
+        fy_cell = _strip_tags(tds[0])
+        if "予" in fy_cell:
+            continue
+        fy_m = re.search(r"(\d{4}/\d{2})", fy_cell)
+        if not fy_m:
+            continue
+        saw_fy_row = True
+        year = int(fy_m.group(1).split("/")[0])
+        if col_idx >= len(tds):
+            continue
+        ni_plain = _strip_tags(tds[col_idx])
+        if _pl_cell_is_loss(ni_plain):
+            loss_years.append(year)
+    if not saw_fy_row:
+        return None
+    if not loss_years:
+        return 0
+    return max(loss_years)
+
+
+def cached_pages(path: str = CACHE_PATH) -> list[tuple[str, str]]:
+    """(url, html) of the IRBANK pages stored in the response cache."""
+    if not os.path.exists(path):
+        return []
+    conn = sqlite3.connect(path)
+    try:
+        rows = conn.execute("SELECT url, body FROM responses WHERE endpoint = 'irbank' AND status = 200").fetchall()
+    finally:
+        conn.close()
+    return [(url, bytes(body).decode("utf-8", errors="replace")) for url, body in rows]
+
+
+def directory_pages(directory: str) -> list[tuple[str, str]]:
+    pages = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.html"))):
+        with open(path, encoding="utf-8", errors="replace") as f:
+            pages.append((path, f.read()))
+    return pages
+
+
+def synthetic_page(rng: random.Random) -> str:
+    """A 決算まとめ-like page: filler markup around 会社業績 and 配当 tables, with the usual cell variants."""
+    def filler(n):
+        return "".join(
+            f'<div class="c{i % 7}"><p>概要 {i} &amp; <a href="/x/{i}">link</a></p>'
+            f'<table><tr><td>{i}</td><td>{i * 3}</td></tr></table></div>\n'
+            for i in range(n)
+        )
+
+    years = range(rng.randint(1995, 2012), 2026)
+    ncols = rng.randint(3, 7)
+    ni_col = rng.randint(1, ncols - 1)
+    ths = ["<th>年度</th>"] + [f"<th>売上{i}</th>" for i in range(1, ncols)]
+    ths[ni_col] = rng.choice(['<th>純利</th>', '<th>当期利益</th>', '<th><span title="当期純利益">純利</span></th>'])
+    ni_cells = ["-", "赤字", "", "△12億", "-3.5億", "1,234億", "98&nbsp;百万", "5,678億"]
+    pl_rows = []
+    for y in years:
+        cells = [f'<td><a href="/{y}">{y}/03</a></td>'] + [f'<td class="r">{rng.randint(1, 999)}億</td>'] * (ncols - 1)
+        cells[ni_col] = f'<td class="r">{rng.choice(ni_cells)}</td>'
+        pl_rows.append("<tr>" + "".join(cells[:ni_col] if rng.random() < 0.05 else cells) + "</tr>")
+    pl_rows.append("<tr><td>2026/03予</td>" + "<td>1</td>" * (ncols - 1) + "</tr>")
+    div_rows = [
+        f'<tr><td>{y}/03</td><td>{rng.choice(["-", "—", "0", "5", "12.5", "1,234.5"])}</td><td>30%</td></tr>'
+        for y in years if rng.random() > 0.05
+    ]
+    div_rows.append("<tr><td>2026/03予</td><td>20</td></tr>")
+    return (
+        "<!DOCTYPE html><html><head><title>決算まとめ</title></head><body>"
+        + filler(rng.randint(200, 600))
+        + '<h2 id="c_pl" class="h">会社業績<small>単位</small></h2>\n<div>\n<table class="bar">'
+        + f'<thead>\n<tr>{"".join(ths)}</tr></thead><tbody>{"".join(pl_rows)}</tbody></table></div>'
+        + filler(rng.randint(50, 200))
+        + '<h2 id="c_dividend">配当</h2> <div><table class="bar"><thead><tr><th>年度</th><th>一株配当</th></tr></thead>'
+        + f'<tbody>{"".join(div_rows)}</tbody></table></div>'
+        + filler(rng.randint(100, 300))
+        + "</body></html>"
+    )
+
+
+def regex_parse(html: str):
+    return _parse_dividend_tbody_after_c_dividend(html), _parse_year_loss_from_pl(html)
+
+
+def single_pass_parse(html: str):
+    rows, loss_rows = parse_results_page(html)
+    return rows, year_loss_from_pl_rows(loss_rows)
+
+
+def best_time(fn, pages: list[str], repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for html in pages:
+            fn(html)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IRBANK 決算まとめ parsing")
+    parser.add_argument("--dir", help="directory of saved *.html pages (default: the HTTP response cache)")
+    parser.add_argument("--synthetic", type=int, default=100, help="pages to generate when no saved pages are found")
+    parser.add_argument("--repeat", type=int, default=3, help="timing runs per parser (best is reported)")
+    args = parser.parse_args()
+
+    corpus = directory_pages(args.dir) if args.dir else cached_pages()
+    source = args.dir or CACHE_PATH
+    if not corpus:
+        rng = random.Random(0)
+        corpus = [(f"synthetic-{i}", synthetic_page(rng)) for i in range(args.synthetic)]
+        source = "synthetic"
+    pages = [html for _, html in corpus]
+    print(f"{len(pages)} pages ({source}), {sum(len(h) for h in pages) / 1e6:.1f}M chars")
+
+    mismatches = [name for name, html in corpus if regex_parse(html) != single_pass_parse(html)]
+    for name in mismatches[:20]:
+        print(f"  mismatch: {name}")
+
+    regex_s = best_time(regex_parse, pages, args.repeat)
+    single_s = best_time(single_pass_parse, pages, args.repeat)
+    print(f"regex parsers:  {regex_s * 1000 / len(pages):.3f} ms/page")
+    print(f"single pass:    {single_s * 1000 / len(pages):.3f} ms/page")
+    print(f"speedup:        {regex_s / single_s:.1f}x")
+    print(f"identical:      {len(pages) - len(mismatches)}/{len(pages)}")
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,32 +2,43 @@
 """
 Database Import Script
 Populates the stocks database from CSV files.
+
+Each file is COPYed into a temp table (import_rows) and applied with a few
+set-based INSERT ... SELECT ... ON CONFLICT statements instead of per-row
+round-trips.
+
+Rows already applied by an earlier run are recorded in import_manifest
+(migration 016); reruns skip files that did not change, only apply the added
+rows of the others and print a diff.
+
+Usage:
+    python bin/import_db.py          # apply rows added since the last import
+    python bin/import_db.py --full   # re-apply every row
 """
 
+import argparse
+import hashlib
+import io
 import os
 import re
+import sys
 import csv
 import glob
 from datetime import datetime, timedelta
-import psycopg2
 from psycopg2.extras import execute_values
 
-# Database connection settings
-DB_NAME = "stocks"
-DB_HOST = "localhost"
-
 # Paths
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 DB_DIR = os.path.join(PROJECT_ROOT, "db")
 
-# Expiry: NOW + 10 years
-DONT_CONSIDER_UNTIL = datetime.now() + timedelta(days=365*10)
+sys.path.append(PROJECT_ROOT)
 
+from lib.db import connection
+from lib.git_utils import get_run_context
 
-def get_connection():
-    """Get a database connection."""
-    return psycopg2.connect(dbname=DB_NAME, host=DB_HOST)
+# Expiry: NOW + 10 years
+DONT_CONSIDER_UNTIL = datetime.now() + timedelta(days=365*10)
 
 
 def extract_market(symbol: str) -> str:
@@ -38,54 +49,205 @@ def extract_market(symbol: str) -> str:
     return "US"
 
 
-def ensure_market_exists(cursor, market_abbrev: str) -> int:
-    """Ensure market exists and return its ID."""
-    cursor.execute(
+def load_csv(filepath: str) -> list[dict]:
+    """Load a CSV file and return list of dicts."""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        return [row for row in reader]
+
+
+def symbol_name_rows(rows: list[dict]) -> list[tuple[str, str]]:
+    """(symbol, name) of each CSV row that has both, in file order."""
+    pairs = []
+    for row in rows:
+        symbol = row.get('Symbol', '').strip()
+        name = row.get('Name', '').strip()
+        if symbol and name:
+            pairs.append((symbol, name))
+    return pairs
+
+
+def file_sha256(filepath: str) -> str:
+    with open(filepath, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def row_hash(symbol: str, name: str) -> str:
+    return hashlib.sha256(f"{symbol}\t{name}".encode('utf-8')).hexdigest()
+
+
+class ImportManifest:
+    """
+    Rows each CSV file contributed to earlier imports (import_manifest tables).
+
+    Loaders first ask unchanged() whether a file (and the files whose rows
+    filter it, depends_on) still has the hash recorded at the last import; if
+    so the CSV is not read at all. Otherwise they pass the rows they would
+    apply (after precedence filters) to pending(), which returns only those
+    not applied before and records the file's new state in the same
+    transaction. Rows that disappeared from a file are reported but not
+    reverted; like a full import, the import never deletes data.
+    """
+
+    def __init__(self, cursor, full: bool = False):
+        self.cursor = cursor
+        self.full = full
+        # file_name -> (added, removed, unchanged count)
+        self.diff: dict[str, tuple[list[tuple[str, str]], list[tuple[str, str]], int]] = {}
+        self._file_hashes: dict[str, str] = {}
+
+    def _file_hash(self, filepath: str) -> str:
+        if filepath not in self._file_hashes:
+            self._file_hashes[filepath] = file_sha256(filepath)
+        return self._file_hashes[filepath]
+
+    def _state_hash(self, filepath: str, depends_on: list[str]) -> str:
+        """import_manifest.file_hash: the file's contents, plus those of the files whose rows filter it."""
+        if not depends_on:
+            return self._file_hash(filepath)
+        combined = self._file_hash(filepath) + "".join(self._file_hash(path) for path in sorted(depends_on))
+        return hashlib.sha256(combined.encode('utf-8')).hexdigest()
+
+    def unchanged(self, filepath: str, depends_on: list[str] = ()) -> list[tuple[str, str]] | None:
         """
-        INSERT INTO stock_markets (abbreviation, name)
-        VALUES (%s, %s)
-        ON CONFLICT (abbreviation) DO UPDATE SET abbreviation = EXCLUDED.abbreviation
-        RETURNING id
-        """,
-        (market_abbrev, market_abbrev)  # Use abbreviation as name for now
-    )
-    return cursor.fetchone()[0]
+        The (symbol, name) rows recorded for filepath when neither it nor the
+        files in depends_on changed since the last import (nothing to apply),
+        else None. Always None with full.
+        """
+        if self.full:
+            return None
+        file_name = os.path.relpath(filepath, PROJECT_ROOT)
+        self.cursor.execute("SELECT file_hash FROM import_manifest WHERE file_name = %s", (file_name,))
+        row = self.cursor.fetchone()
+        if row is None or row[0] != self._state_hash(filepath, depends_on):
+            return None
+        self.cursor.execute(
+            "SELECT symbol, company_name FROM import_manifest_rows WHERE file_name = %s", (file_name,)
+        )
+        recorded = self.cursor.fetchall()
+        self.diff[file_name] = ([], [], len(recorded))
+        return recorded
+
+    def pending(self, filepath: str, pairs: list[tuple[str, str]],
+                depends_on: list[str] = ()) -> list[tuple[str, str]]:
+        """Rows of pairs to apply now: those not in the manifest for filepath (all of them with full)."""
+        file_name = os.path.relpath(filepath, PROJECT_ROOT)
+        self.cursor.execute(
+            "SELECT row_hash, symbol, company_name FROM import_manifest_rows WHERE file_name = %s",
+            (file_name,)
+        )
+        previous = {h: (symbol, name) for h, symbol, name in self.cursor.fetchall()}
+        current = {row_hash(symbol, name): (symbol, name) for symbol, name in pairs}
+        added = pairs if self.full else [(symbol, name) for symbol, name in pairs if row_hash(symbol, name) not in previous]
+        removed = [pair for h, pair in previous.items() if h not in current]
+        self.diff[file_name] = (
+            [pair for h, pair in current.items() if h not in previous], removed, len(current.keys() & previous.keys())
+        )
+
+        self.cursor.execute(
+            """
+            INSERT INTO import_manifest (file_name, file_hash, row_count, imported_at, updated_by)
+            VALUES (%s, %s, %s, NOW(), %s)
+            ON CONFLICT (file_name) DO UPDATE
+            SET file_hash = EXCLUDED.file_hash, row_count = EXCLUDED.row_count,
+                imported_at = EXCLUDED.imported_at, updated_by = EXCLUDED.updated_by
+            """,
+            (file_name, self._state_hash(filepath, depends_on), len(pairs), get_run_context().updated_by)
+        )
+        if removed:
+            self.cursor.execute(
+                "DELETE FROM import_manifest_rows WHERE file_name = %s AND row_hash = ANY(%s)",
+                (file_name, [h for h in previous if h not in current])
+            )
+        new_rows = [(file_name, h, symbol, name) for h, (symbol, name) in current.items() if h not in previous]
+        if new_rows:
+            execute_values(self.cursor, """
+                INSERT INTO import_manifest_rows (file_name, row_hash, symbol, company_name)
+                VALUES %s
+            """, new_rows)
+        return added
 
+    def forget_missing(self, seen_files: set[str]):
+        """Report and drop manifest entries of files that no longer exist."""
+        self.cursor.execute("SELECT file_name FROM import_manifest")
+        for (file_name,) in self.cursor.fetchall():
+            if file_name in seen_files:
+                continue
+            self.cursor.execute(
+                "SELECT symbol, company_name FROM import_manifest_rows WHERE file_name = %s", (file_name,)
+            )
+            self.diff[file_name] = ([], self.cursor.fetchall(), 0)
+            self.cursor.execute("DELETE FROM import_manifest WHERE file_name = %s", (file_name,))
+
+    def print_diff(self, max_rows: int = 20):
+        print("\n=== Import Diff ===")
+        for file_name, (added, removed, unchanged) in sorted(self.diff.items()):
+            print(f"  {file_name}: +{len(added)} -{len(removed)} ({unchanged} unchanged)")
+            for sign, rows in (('+', added), ('-', removed)):
+                for symbol, name in rows[:max_rows]:
+                    print(f"    {sign} {symbol}: {name}")
+                if len(rows) > max_rows:
+                    print(f"    {sign} ... {len(rows) - max_rows} more")
+        if any(removed for _, removed, _ in self.diff.values()):
+            print("  (removed rows are not reverted in the database)")
 
-def ensure_company_exists(cursor, company_name: str) -> int:
-    """Ensure company exists and return its ID."""
+
+def create_staging_table(cursor):
+    """Temp table the loaders COPY each file into before the set-based upserts."""
     cursor.execute(
         """
-        INSERT INTO companies (company_name)
-        VALUES (%s)
-        ON CONFLICT (company_name) DO UPDATE SET company_name = EXCLUDED.company_name
-        RETURNING id
-        """,
-        (company_name,)
+        CREATE TEMP TABLE import_rows (
+            seq INTEGER NOT NULL,
+            symbol VARCHAR(50) NOT NULL,
+            company_name VARCHAR(255) NOT NULL,
+            market VARCHAR(10) NOT NULL
+        ) ON COMMIT DROP
+        """
     )
-    return cursor.fetchone()[0]
 
 
-def ensure_stock_listing_exists(cursor, symbol: str, company_id: int, market_id: int):
-    """Ensure stock listing exists."""
+def stage_rows(cursor, pairs: list[tuple[str, str]]):
+    """Replace the contents of import_rows with pairs (file order kept in seq) using COPY."""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for seq, (symbol, name) in enumerate(pairs):
+        writer.writerow((seq, symbol, name, extract_market(symbol)))
+    buf.seek(0)
+    cursor.execute("TRUNCATE import_rows")
+    cursor.copy_expert("COPY import_rows (seq, symbol, company_name, market) FROM STDIN WITH (FORMAT csv)", buf)
+
+
+def insert_staged_markets_and_listings(cursor):
+    """
+    Ensure a market for every staged row and a listing for every staged symbol.
+    Existing listings are kept; within the file the first row of a symbol wins.
+    """
+    cursor.execute(
+        """
+        INSERT INTO stock_markets (abbreviation, name)
+        SELECT DISTINCT market, market FROM import_rows
+        ON CONFLICT (abbreviation) DO NOTHING
+        """
+    )
     cursor.execute(
         """
         INSERT INTO stock_listings (symbol, company_id, market_id)
-        VALUES (%s, %s, %s)
+        SELECT DISTINCT ON (r.symbol) r.symbol, c.id, m.id
+        FROM import_rows r
+        JOIN companies c ON c.company_name = r.company_name
+        JOIN stock_markets m ON m.abbreviation = r.market
+        ORDER BY r.symbol, r.seq
         ON CONFLICT (symbol) DO NOTHING
-        """,
-        (symbol, company_id, market_id)
+        """
     )
 
 
-def load_csv(filepath: str) -> list[dict]:
-    """Load a CSV file and return list of dicts."""
-    with open(filepath, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        return [row for row in reader]
+def first_dividend_files() -> list[str]:
+    """All [YYYY]_first_dividend.csv files, oldest year first."""
+    return sorted(glob.glob(os.path.join(DB_DIR, "*_first_dividend.csv")))
 
 
-def load_first_dividend_files(cursor) -> set[str]:
+def load_first_dividend_files(cursor, manifest: ImportManifest) -> set[str]:
     """
     Load all [YYYY]_first_dividend.csv files.
     Returns set of company names that were loaded (ignore_until_set).
@@ -93,54 +255,45 @@ def load_first_dividend_files(cursor) -> set[str]:
     print("\n=== Loading First Dividend Files ===")
     print(f"  dont_consider_until = {DONT_CONSIDER_UNTIL}")
     
-    # Find all first_dividend files
-    pattern = os.path.join(DB_DIR, "*_first_dividend.csv")
-    files = glob.glob(pattern)
-    
     ignore_until_set = set()  # Track company names already processed
     
-    for filepath in sorted(files):
+    for filepath in first_dividend_files():
         print(f"  Processing {os.path.basename(filepath)}...")
         
-        rows = load_csv(filepath)
-        count = 0
-        skipped = 0
+        recorded = manifest.unchanged(filepath)
+        if recorded is not None:
+            ignore_until_set.update(name for _, name in recorded)
+            print("    Unchanged since last import")
+            continue
+        file_pairs = symbol_name_rows(load_csv(filepath))
+        ignore_until_set.update(name for _, name in file_pairs)
+        pairs = manifest.pending(filepath, file_pairs)
+        if not pairs:
+            print("    No new rows")
+            continue
+        stage_rows(cursor, pairs)
         
-        for row in rows:
-            symbol = row.get('Symbol', '').strip()
-            name = row.get('Name', '').strip()
-            
-            if not symbol or not name:
-                continue
-            
-            market_abbrev = extract_market(symbol)
-            
-            # Insert company with dont_consider_until (preserve existing date)
-            cursor.execute(
-                """
-                INSERT INTO companies (company_name, dont_consider_until, dont_consider_reason)
-                VALUES (%s, %s, %s)
-                ON CONFLICT (company_name) DO UPDATE 
-                SET dont_consider_until = COALESCE(companies.dont_consider_until, EXCLUDED.dont_consider_until),
-                    dont_consider_reason = COALESCE(companies.dont_consider_reason, EXCLUDED.dont_consider_reason)
-                RETURNING id, (xmax = 0) as inserted
-                """,
-                (name, DONT_CONSIDER_UNTIL, 'UNKNOWN')
-            )
-            result = cursor.fetchone()
-            company_id = result[0]
-            was_inserted = result[1]
-            
-            if was_inserted:
-                count += 1
-            else:
-                skipped += 1
-            
-            # Always create stock listing
-            market_id = ensure_market_exists(cursor, market_abbrev)
-            ensure_stock_listing_exists(cursor, symbol, company_id, market_id)
-            
-            ignore_until_set.add(name)
+        # Insert companies with dont_consider_until (preserve existing date)
+        cursor.execute(
+            """
+            INSERT INTO companies (company_name, dont_consider_until, dont_consider_reason)
+            SELECT DISTINCT company_name, %s::timestamp, 'UNKNOWN' FROM import_rows
+            ON CONFLICT (company_name) DO UPDATE 
+            SET dont_consider_until = COALESCE(companies.dont_consider_until, EXCLUDED.dont_consider_until),
+                dont_consider_reason = COALESCE(companies.dont_consider_reason, EXCLUDED.dont_consider_reason)
+            RETURNING company_name, (xmax = 0) as inserted
+            """,
+            (DONT_CONSIDER_UNTIL,)
+        )
+        inserted = {name for name, was_inserted in cursor.fetchall() if was_inserted}
+        # Counted per CSV row like the row-by-row import: the first row of each
+        # new company added it, every other row was skipped
+        first_rows = dict.fromkeys(name for _, name in pairs)
+        count = sum(1 for name in first_rows if name in inserted)
+        skipped = len(pairs) - count
+        
+        # Always create stock listings
+        insert_staged_markets_and_listings(cursor)
         
         print(f"    Added {count} new companies, skipped {skipped} existing")
     
@@ -148,7 +301,7 @@ def load_first_dividend_files(cursor) -> set[str]:
     return ignore_until_set
 
 
-def load_disqualified(cursor, ignore_until_set: set[str]):
+def load_disqualified(cursor, manifest: ImportManifest, ignore_until_set: set[str]):
     """Load disqualified stocks, skipping those in ignore_until_set."""
     print("\n=== Loading Disqualified Stocks ===")
     
@@ -157,48 +310,38 @@ def load_disqualified(cursor, ignore_until_set: set[str]):
         print("  No disqualified.csv found, skipping...")
         return
     
-    rows = load_csv(filepath)
-    count = 0
-    skipped = 0
+    # ignore_until_set comes from the first dividend files, so they are part of this file's state
+    if manifest.unchanged(filepath, depends_on=first_dividend_files()) is not None:
+        print("  Unchanged since last import")
+        return
+    pairs = symbol_name_rows(load_csv(filepath))
+    # Skip if in ignore_until_set (first dividend takes precedence)
+    kept = [(symbol, name) for symbol, name in pairs if name not in ignore_until_set]
+    skipped = len(pairs) - len(kept)
+    kept = manifest.pending(filepath, kept, depends_on=first_dividend_files())
+    if not kept:
+        print(f"  No new disqualified companies (skipped {skipped} in ignore_until_set)")
+        return
+    stage_rows(cursor, kept)
     
-    for row in rows:
-        symbol = row.get('Symbol', '').strip()
-        name = row.get('Name', '').strip()
-        
-        if not symbol or not name:
-            continue
-        
-        # Skip if in ignore_until_set (first dividend takes precedence)
-        if name in ignore_until_set:
-            skipped += 1
-            continue
-        
-        market_abbrev = extract_market(symbol)
-        
-        # Insert company as disqualified (preserve existing values)
-        cursor.execute(
-            """
-            INSERT INTO companies (company_name, is_disqualified, disqualified_reason)
-            VALUES (%s, %s, %s)
-            ON CONFLICT (company_name) DO UPDATE 
-            SET is_disqualified = COALESCE(companies.is_disqualified, EXCLUDED.is_disqualified),
-                disqualified_reason = COALESCE(companies.disqualified_reason, EXCLUDED.disqualified_reason)
-            RETURNING id
-            """,
-            (name, True, 'unknown')
-        )
-        company_id = cursor.fetchone()[0]
-        
-        # Always create stock listing
-        market_id = ensure_market_exists(cursor, market_abbrev)
-        ensure_stock_listing_exists(cursor, symbol, company_id, market_id)
-        
-        count += 1
+    # Insert companies as disqualified (preserve existing values)
+    cursor.execute(
+        """
+        INSERT INTO companies (company_name, is_disqualified, disqualified_reason)
+        SELECT DISTINCT company_name, TRUE, 'unknown' FROM import_rows
+        ON CONFLICT (company_name) DO UPDATE 
+        SET is_disqualified = COALESCE(companies.is_disqualified, EXCLUDED.is_disqualified),
+            disqualified_reason = COALESCE(companies.disqualified_reason, EXCLUDED.disqualified_reason)
+        """
+    )
+    
+    # Always create stock listings
+    insert_staged_markets_and_listings(cursor)
     
-    print(f"  Loaded {count} disqualified companies (skipped {skipped} in ignore_until_set)")
+    print(f"  Loaded {len(kept)} disqualified companies (skipped {skipped} in ignore_until_set)")
 
 
-def load_quarterly_loss(cursor):
+def load_quarterly_loss(cursor, manifest: ImportManifest):
     """Load stocks with quarterly loss."""
     print("\n=== Loading Quarterly Loss Stocks ===")
     
@@ -207,41 +350,32 @@ def load_quarterly_loss(cursor):
         print("  No with_quartal_loss.csv found, skipping...")
         return
     
-    rows = load_csv(filepath)
-    count = 0
+    if manifest.unchanged(filepath) is not None:
+        print("  Unchanged since last import")
+        return
+    pairs = manifest.pending(filepath, symbol_name_rows(load_csv(filepath)))
+    if not pairs:
+        print("  No new companies with quarterly loss")
+        return
+    stage_rows(cursor, pairs)
     
-    for row in rows:
-        symbol = row.get('Symbol', '').strip()
-        name = row.get('Name', '').strip()
-        
-        if not symbol or not name:
-            continue
-        
-        market_abbrev = extract_market(symbol)
-        
-        # Insert or update company with had_quarter_loss
-        cursor.execute(
-            """
-            INSERT INTO companies (company_name, had_quarter_loss)
-            VALUES (%s, %s)
-            ON CONFLICT (company_name) DO UPDATE 
-            SET had_quarter_loss = EXCLUDED.had_quarter_loss
-            RETURNING id
-            """,
-            (name, True)
-        )
-        company_id = cursor.fetchone()[0]
-        
-        # Always create stock listing
-        market_id = ensure_market_exists(cursor, market_abbrev)
-        ensure_stock_listing_exists(cursor, symbol, company_id, market_id)
-        
-        count += 1
+    # Insert or update companies with had_quarter_loss
+    cursor.execute(
+        """
+        INSERT INTO companies (company_name, had_quarter_loss)
+        SELECT DISTINCT company_name, TRUE FROM import_rows
+        ON CONFLICT (company_name) DO UPDATE 
+        SET had_quarter_loss = EXCLUDED.had_quarter_loss
+        """
+    )
+    
+    # Always create stock listings
+    insert_staged_markets_and_listings(cursor)
     
-    print(f"  Loaded {count} companies with quarterly loss")
+    print(f"  Loaded {len(pairs)} companies with quarterly loss")
 
 
-def load_portfolio(cursor):
+def load_portfolio(cursor, manifest: ImportManifest):
     """Load portfolio stocks from downloads/portfolio_*.csv files."""
     print("\n=== Loading Portfolio Stocks ===")
     
@@ -254,103 +388,112 @@ def load_portfolio(cursor):
     
     portfolio_companies = set()  # Track unique companies added to portfolio
     
-    for filepath in sorted(files):
+    files = sorted(files)
+    for i, filepath in enumerate(files):
         print(f"  Processing {os.path.basename(filepath)}...")
         
-        rows = load_csv(filepath)
+        # Earlier portfolio files decide which companies this one adds
+        recorded = manifest.unchanged(filepath, depends_on=files[:i])
+        if recorded is not None:
+            portfolio_companies.update(name for _, name in recorded)
+            print("    Unchanged since last import")
+            continue
         
-        for row in rows:
-            symbol = row.get('Symbol', '').strip()
-            name = row.get('Name', '').strip()
-            
-            if not symbol or not name:
-                continue
-            
-            # Skip if already added to portfolio
-            if name in portfolio_companies:
-                continue
-            
-            market_abbrev = extract_market(symbol)
-            
-            # Ensure company exists
-            company_id = ensure_company_exists(cursor, name)
-            
-            # Ensure stock listing exists
-            market_id = ensure_market_exists(cursor, market_abbrev)
-            ensure_stock_listing_exists(cursor, symbol, company_id, market_id)
-            
-            # Add to portfolio (ignore if already there)
-            cursor.execute(
-                """
-                INSERT INTO portfolio (company_id)
-                VALUES (%s)
-                ON CONFLICT (company_id) DO NOTHING
-                """,
-                (company_id,)
-            )
-            
-            portfolio_companies.add(name)
+        # Skip if already added to portfolio (first row of a company wins)
+        pairs = []
+        for symbol, name in symbol_name_rows(load_csv(filepath)):
+            if name not in portfolio_companies:
+                pairs.append((symbol, name))
+                portfolio_companies.add(name)
+        pairs = manifest.pending(filepath, pairs, depends_on=files[:i])
+        if not pairs:
+            print("    No new rows")
+            continue
+        stage_rows(cursor, pairs)
+        
+        # Ensure companies and stock listings exist
+        cursor.execute(
+            """
+            INSERT INTO companies (company_name)
+            SELECT DISTINCT company_name FROM import_rows
+            ON CONFLICT (company_name) DO NOTHING
+            """
+        )
+        insert_staged_markets_and_listings(cursor)
+        
+        # Add to portfolio (ignore if already there)
+        cursor.execute(
+            """
+            INSERT INTO portfolio (company_id)
+            SELECT c.id FROM import_rows r JOIN companies c ON c.company_name = r.company_name
+            ON CONFLICT (company_id) DO NOTHING
+            """
+        )
     
     print(f"  Total portfolio companies: {len(portfolio_companies)}")
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Populate the stocks database from CSV files")
+    parser.add_argument("--full", action="store_true", help="re-apply every row, not only rows added since the last import")
+    args = parser.parse_args()
+
     print("=" * 50)
     print("Stock Database Import")
     print("=" * 50)
     
-    conn = get_connection()
-    cursor = conn.cursor()
-    
     try:
-        # 1. Load first dividend files
-        ignore_until_set = load_first_dividend_files(cursor)
+        with connection() as conn, conn.cursor() as cursor:
+            create_staging_table(cursor)
+            manifest = ImportManifest(cursor, full=args.full)
+
+            # 1. Load first dividend files
+            ignore_until_set = load_first_dividend_files(cursor, manifest)
         
-        # 2. Load disqualified stocks (skip those in ignore_until_set)
-        load_disqualified(cursor, ignore_until_set)
+            # 2. Load disqualified stocks (skip those in ignore_until_set)
+            load_disqualified(cursor, manifest, ignore_until_set)
         
-        # 3. Load quarterly loss stocks
-        load_quarterly_loss(cursor)
+            # 3. Load quarterly loss stocks
+            load_quarterly_loss(cursor, manifest)
         
-        # 4. Load portfolio stocks
-        load_portfolio(cursor)
+            # 4. Load portfolio stocks
+            load_portfolio(cursor, manifest)
+
+            manifest.forget_missing(set(manifest.diff))
+            manifest.print_diff()
         
-        # Commit all changes
-        conn.commit()
+            # Commit all changes
+            conn.commit()
         
-        # Print summary
-        print("\n" + "=" * 50)
-        print("Import Complete!")
-        print("=" * 50)
+            # Print summary
+            print("\n" + "=" * 50)
+            print("Import Complete!")
+            print("=" * 50)
         
-        cursor.execute("SELECT COUNT(*) FROM companies")
-        print(f"Total companies: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM companies")
+            print(f"Total companies: {cursor.fetchone()[0]}")
         
-        cursor.execute("SELECT COUNT(*) FROM stock_markets")
-        print(f"Total markets: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM stock_markets")
+            print(f"Total markets: {cursor.fetchone()[0]}")
         
-        cursor.execute("SELECT COUNT(*) FROM stock_listings")
-        print(f"Total stock listings: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM stock_listings")
+            print(f"Total stock listings: {cursor.fetchone()[0]}")
         
-        cursor.execute("SELECT COUNT(*) FROM companies WHERE is_disqualified = TRUE")
-        print(f"Disqualified companies: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM companies WHERE is_disqualified = TRUE")
+            print(f"Disqualified companies: {cursor.fetchone()[0]}")
         
-        cursor.execute("SELECT COUNT(*) FROM companies WHERE had_quarter_loss = TRUE")
-        print(f"Companies with quarterly loss: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM companies WHERE had_quarter_loss = TRUE")
+            print(f"Companies with quarterly loss: {cursor.fetchone()[0]}")
         
-        cursor.execute("SELECT COUNT(*) FROM companies WHERE dont_consider_until IS NOT NULL")
-        print(f"Companies with dont_consider_until: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM companies WHERE dont_consider_until IS NOT NULL")
+            print(f"Companies with dont_consider_until: {cursor.fetchone()[0]}")
         
-        cursor.execute("SELECT COUNT(*) FROM portfolio")
-        print(f"Portfolio companies: {cursor.fetchone()[0]}")
+            cursor.execute("SELECT COUNT(*) FROM portfolio")
+            print(f"Portfolio companies: {cursor.fetchone()[0]}")
         
     except Exception as e:
-        conn.rollback()
         print(f"\nError: {e}")
         raise
-    finally:
-        cursor.close()
-        conn.close()
 
 
 if __name__ == "__main__":
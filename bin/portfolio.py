@@ -2,8 +2,10 @@ import os
 import sys
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from lib.data import get_merged_pd, PE, PB, PE_PB, PRICE
+from lib.data import EXPORT_DTYPES, get_merged_pd, PE, PB, PE_PB
 from lib.downloader import get_portfolio_filename
+from lib.ingest import read_export
+from lib.ranking import neg_eps_score, rank_order
 from report_types import ReportType
 import pandas as pd
 
@@ -11,29 +13,19 @@ df = get_merged_pd(pe_file=get_portfolio_filename(ReportType.FUND.value), pb_fil
 
 
 print("=== Stocks with negative EPS (sorted by PB * |EPS| / price, descending) ===")
-_neg = df[df.EPS < 0].copy()
+_neg = df[df.EPS < 0]
 if _neg.empty:
     print(_neg)
 else:
-    if PRICE in _neg.columns:
-        _price = pd.to_numeric(_neg[PRICE], errors='coerce')
-    else:
-        _price = pd.to_numeric(_neg[PE], errors='coerce') * pd.to_numeric(_neg['EPS'], errors='coerce')
-    _den = _price.abs()
-    _den = _den.mask(_den == 0)
-    _neg['_sort_neg_eps'] = (
-        pd.to_numeric(_neg[PB], errors='coerce')
-        * pd.to_numeric(_neg['EPS'], errors='coerce').abs()
-        / _den
-    )
-    print(_neg.sort_values(by='_sort_neg_eps', ascending=False, na_position='last').drop(columns=['_sort_neg_eps']))
+    # Ties keep file order (NaN scores last)
+    print(_neg.take(rank_order([neg_eps_score(_neg)], ascending=False)))
 
 print("\n=== Stocks with high PE (>10) or PB (>1) ===")
 print(df[(df[PE] > 10) | (df[PB] > 1)].sort_values(by=PE_PB, ascending=False))
 
 # Read the financial strength portfolio file
 fs_file = get_portfolio_filename(ReportType.FINANCIAL_STRENGTH.value)
-fs_df = pd.read_csv(fs_file, encoding='latin-1')
+fs_df = read_export(fs_file, EXPORT_DTYPES)
 
 merged_df = pd.merge(df, fs_df, on='Symbol', suffixes=('', '_fs'))
 
@@ -0,0 +1,174 @@
+"""
+Refresh the companies cache ahead of the interactive screener.
+
+Ranks the latest PE.csv / PB.csv exactly like bin/screen.py and enriches
+candidates top-ranked first, writing year_loss / dividend bundle / deferrals
+through the same code path. Companies whose cached row is still valid
+(unexpired IRBANK bundle, verified, or already excluded by the cache) are
+skipped. Progress is stored per run in prewarm_runs / prewarm_progress
+(migration 015), so an interrupted run resumes where it stopped.
+
+Usage:
+    python bin/prewarm.py                 # one pass over the whole ranking
+    python bin/prewarm.py --limit 300     # only the 300 best-ranked candidates
+    python bin/prewarm.py --daemon --interval 21600
+"""
+
+import argparse
+import hashlib
+import os
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from psycopg2.extras import execute_values
+
+from lib.data import SYMBOL, NAME
+from lib.db import connection
+from lib.dividends import _use_pg_dividend_bundle
+from lib.fundamentals import get_fundamentals_store
+from lib.git_utils import get_run_context
+from lib.metrics import METRICS_PATH, RunMetrics
+from lib.screening import CandidateCursor, ScreenResult, ScreeningEngine
+
+PREWARM_BATCH_SIZE = 20
+DEFAULT_INTERVAL_SECONDS = 6 * 60 * 60
+PREWARM_METRICS_PATH = os.path.join(os.path.dirname(METRICS_PATH), "prewarm_metrics.jsonl")
+
+
+def ranking_key(engine: ScreeningEngine) -> str:
+    """Fingerprint of the ranking input files (changes when a new export is copied in)."""
+    parts = []
+    for path in (engine.pe_file, engine.pb_file):
+        st = os.stat(path)
+        parts.append(f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}")
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def get_or_create_run(key: str, total_symbols: int, restart: bool) -> tuple[int, set[str]]:
+    """Latest unfinished run for this ranking (and its done symbols), or a new run."""
+    with connection() as conn, conn.cursor() as cursor:
+        if not restart:
+            cursor.execute("""
+                SELECT id FROM prewarm_runs
+                WHERE ranking_key = %s AND finished_at IS NULL
+                ORDER BY id DESC LIMIT 1
+            """, (key,))
+            row = cursor.fetchone()
+            if row:
+                run_id = row[0]
+                cursor.execute("SELECT symbol FROM prewarm_progress WHERE run_id = %s", (run_id,))
+                return run_id, {r[0] for r in cursor.fetchall()}
+        cursor.execute("""
+            INSERT INTO prewarm_runs (ranking_key, total_symbols, updated_by)
+            VALUES (%s, %s, %s)
+            RETURNING id
+        """, (key, total_symbols, get_run_context().updated_by))
+        return cursor.fetchone()[0], set()
+
+
+def record_progress(run_id: int, statuses: list[tuple[str, str]]) -> None:
+    """Mark (symbol, status) pairs as done for run_id."""
+    if not statuses:
+        return
+    with connection() as conn, conn.cursor() as cursor:
+        execute_values(cursor, """
+            INSERT INTO prewarm_progress (run_id, symbol, status)
+            VALUES %s
+            ON CONFLICT (run_id, symbol) DO UPDATE
+            SET status = EXCLUDED.status, processed_at = NOW()
+        """, [(run_id, symbol, status) for symbol, status in statuses])
+
+
+def finish_run(run_id: int) -> None:
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("UPDATE prewarm_runs SET finished_at = NOW() WHERE id = %s", (run_id,))
+
+
+def cache_is_fresh(engine: ScreeningEngine, cached: dict | None) -> bool:
+    """True when the screener would not learn anything new by fetching this company now."""
+    if not cached:
+        return False
+    return _use_pg_dividend_bundle(cached) or engine.rules.rejects_cached(cached)
+
+
+def prewarm_pass(engine: ScreeningEngine, limit: int | None, batch_size: int, restart: bool) -> dict:
+    """One pass over the current ranking; returns counts per status."""
+    ranking = engine.rank(engine.exclude(engine.load()))
+    cursor = CandidateCursor(ranking.rows(SYMBOL, NAME))
+    ranked = cursor.next_batch(limit) if limit is not None else list(cursor)
+    symbols = [symbol for symbol, _ in ranked]
+    names = dict(ranked)
+
+    run_id, done = get_or_create_run(ranking_key(engine), len(symbols), restart)
+    pending = [s for s in symbols if s not in done]
+    print(f"Prewarm run {run_id}: {len(symbols)} ranked, {len(done)} already done, {len(pending)} to go", flush=True)
+
+    counts: dict[str, int] = {}
+    fresh = [s for s in pending if cache_is_fresh(engine, engine.snapshot.stock_info.get(names[s]))]
+    record_progress(run_id, [(s, 'fresh') for s in fresh])
+    counts['fresh'] = len(fresh)
+    fresh_set = set(fresh)
+    to_fetch = [s for s in pending if s not in fresh_set]
+
+    for start in range(0, len(to_fetch), batch_size):
+        candidates = to_fetch[start:start + batch_size]
+        top_names = {s: names[s] for s in candidates}
+        stock_info, not_found_symbols, stock_info_cache, cache_rejected = engine.enrich(candidates, top_names)
+        result = ScreenResult()
+        engine.filter(result, candidates, top_names, stock_info, not_found_symbols, stock_info_cache, cache_rejected)
+
+        statuses = []
+        for symbol in candidates:
+            if symbol in not_found_symbols:
+                status = 'not_found'
+            elif symbol in result.excluded:
+                status = 'excluded'
+            else:
+                status = 'refreshed'
+            statuses.append((symbol, status))
+            counts[status] = counts.get(status, 0) + 1
+        record_progress(run_id, statuses)
+        print(f"  {start + len(candidates)}/{len(to_fetch)} fetched", flush=True)
+
+    finish_run(run_id)
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Refresh the companies cache ahead of bin/screen.py")
+    parser.add_argument("--limit", type=int, default=None, help="only the N best-ranked candidates")
+    parser.add_argument("--batch-size", type=int, default=PREWARM_BATCH_SIZE, help="symbols per fetch/write batch")
+    parser.add_argument("--workers", type=int, default=None, help="symbols fetched concurrently (default: screener setting)")
+    parser.add_argument("--restart", action="store_true", help="start a new run instead of resuming an unfinished one")
+    parser.add_argument("--daemon", action="store_true", help="repeat the pass every --interval seconds")
+    parser.add_argument("--interval", type=int, default=DEFAULT_INTERVAL_SECONDS, help="seconds between daemon passes")
+    args = parser.parse_args()
+
+    engine = ScreeningEngine() if args.workers is None else ScreeningEngine(fetch_workers=args.workers)
+    restart = args.restart
+    while True:
+        run_metrics = RunMetrics()
+        try:
+            with run_metrics.activate():
+                counts = prewarm_pass(engine, args.limit, args.batch_size, restart)
+        except Exception as e:
+            if not args.daemon:
+                raise
+            # Keep the daemon alive; the unfinished run resumes on the next pass
+            print(f"\nError: {e}", flush=True)
+        else:
+            run_metrics.extra["prewarm"] = counts
+            print(f"[Prewarm] {' '.join(f'{k}={v}' for k, v in sorted(counts.items()))}", flush=True)
+            print(run_metrics.write(PREWARM_METRICS_PATH), flush=True)
+        if not args.daemon:
+            break
+        # The daemon never reaches the atexit compaction; fold this pass's part files now
+        get_fundamentals_store().compact()
+        restart = False
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+Recompute year_loss / dividend / balance sheet fields from the local
+fundamentals store (lib.fundamentals) without any network calls.
+
+Usage:
+    python bin/recompute_fundamentals.py                  # all stored symbols
+    python bin/recompute_fundamentals.py 7203.T SAFE.L    # selected symbols
+    python bin/recompute_fundamentals.py --out derived.csv
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from lib.fundamentals import PARQUET_AVAILABLE, get_fundamentals_store
+from lib.screening import ScreeningRules
+
+pd.set_option('display.max_columns', None)
+pd.set_option('display.width', 200)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recompute derived fundamentals offline")
+    parser.add_argument("symbols", nargs="*", help="symbols to recompute (default: all stored)")
+    parser.add_argument("--out", help="write the result to this CSV file")
+    args = parser.parse_args()
+
+    if not PARQUET_AVAILABLE:
+        sys.exit("pyarrow is required for the fundamentals store")
+
+    derived = get_fundamentals_store().recompute(args.symbols or None)
+    rules = ScreeningRules()
+    derived['rejected'] = [
+        rules.rejects({k: (None if pd.isna(v) else v) for k, v in row.items()})
+        for row in derived[['year_loss', 'last_no_div_year', 'AL_ratio', 'cash_debt_ok']].to_dict('records')
+    ]
+
+    if args.out:
+        derived.to_csv(args.out)
+    print(derived)
+    print(f"{len(derived)} symbols, {int(derived['rejected'].sum())} rejected by the current rules")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,30 @@
+-- Migration: Add prewarm run / progress tables
+-- Date: 2026-10-18
+-- Description: bin/prewarm.py refreshes the companies cache ahead of the screener,
+-- top-ranked first; progress is stored per run so an interrupted run resumes.
+
+CREATE TABLE prewarm_runs (
+    id SERIAL PRIMARY KEY,
+    ranking_key VARCHAR(64) NOT NULL,
+    total_symbols INTEGER NOT NULL,
+    started_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMP NULL,
+    updated_by VARCHAR(50) NULL
+);
+
+CREATE TABLE prewarm_progress (
+    run_id INTEGER NOT NULL REFERENCES prewarm_runs(id) ON DELETE CASCADE,
+    symbol VARCHAR(50) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    processed_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (run_id, symbol)
+);
+
+CREATE INDEX idx_prewarm_runs_ranking_key ON prewarm_runs(ranking_key) WHERE finished_at IS NULL;
+
+-- Add comments for documentation
+COMMENT ON TABLE prewarm_runs IS 'One pass of bin/prewarm.py over the PE*PB ranking';
+COMMENT ON COLUMN prewarm_runs.ranking_key IS 'Fingerprint (size, mtime) of the PE.csv / PB.csv the run ranked';
+COMMENT ON COLUMN prewarm_runs.finished_at IS 'NULL while the run is in progress or was interrupted (resumable)';
+COMMENT ON TABLE prewarm_progress IS 'Symbols already handled by a prewarm run';
+COMMENT ON COLUMN prewarm_progress.status IS 'refreshed | excluded | not_found | fresh (cache still valid, not fetched)';
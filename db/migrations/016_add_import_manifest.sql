@@ -0,0 +1,28 @@
+-- Migration: Add import manifest tables
+-- Date: 2026-10-18
+-- Description: bin/import_db.py records which CSV rows it has applied, so reruns
+-- only stage rows that were added since the last import and report the diff.
+
+CREATE TABLE import_manifest (
+    file_name VARCHAR(255) PRIMARY KEY,
+    file_hash VARCHAR(64) NOT NULL,
+    row_count INTEGER NOT NULL,
+    imported_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_by VARCHAR(50) NULL
+);
+
+CREATE TABLE import_manifest_rows (
+    file_name VARCHAR(255) NOT NULL REFERENCES import_manifest(file_name) ON DELETE CASCADE,
+    row_hash VARCHAR(64) NOT NULL,
+    symbol VARCHAR(50) NOT NULL,
+    company_name VARCHAR(255) NOT NULL,
+    PRIMARY KEY (file_name, row_hash)
+);
+
+-- Add comments for documentation
+COMMENT ON TABLE import_manifest IS 'CSV files applied by bin/import_db.py';
+COMMENT ON COLUMN import_manifest.file_name IS 'Path relative to the project root, e.g. db/disqualified.csv';
+COMMENT ON COLUMN import_manifest.file_hash IS 'SHA-256 of the file contents at the last import';
+COMMENT ON COLUMN import_manifest.row_count IS 'Rows of the file applied at the last import (after precedence filters)';
+COMMENT ON TABLE import_manifest_rows IS 'Symbol / name rows already applied per file';
+COMMENT ON COLUMN import_manifest_rows.row_hash IS 'SHA-256 of symbol and company name';
@@ -1,5 +1,6 @@
 import os
 import pandas as pd
+from lib.ingest import read_export
 from report_types import ReportType
 
 # Column name constants
@@ -10,11 +11,27 @@ PE_PB = 'PE*PB'
 SYMBOL = 'Symbol'
 CURRENT_RATIO = 'Current Ratio'
 PRICE = 'Price'
+MARKET = 'Market'
+
+# Explicit dtypes for the PE / PB exports (see lib.ingest). PE and PB stay
+# float64: PE*PB is the ranking key and float32 products misorder near-ties.
+EXPORT_DTYPES = {
+    SYMBOL: 'category',
+    NAME: 'category',
+    PE: 'float64',
+    PB: 'float64',
+    CURRENT_RATIO: 'float32',
+}
+
+def market_of(symbols: pd.Series) -> pd.Series:
+    """Market abbreviation per symbol: suffix after the last '.', 'US' without one
+    (vectorized form of import_db.extract_market, e.g. TAPARIA.BO -> BO)."""
+    return symbols.str.rsplit('.', n=1).str[1].fillna('US')
 
 def get_merged_pd(pe_file: str, pb_file: str) -> pd.DataFrame:
     """Merge PE and PB data files into a single DataFrame"""
-    pe_df = pd.read_csv(pe_file, encoding='latin-1')
-    pb_df = pd.read_csv(pb_file, encoding='latin-1')
+    pe_df = read_export(pe_file, EXPORT_DTYPES)
+    pb_df = read_export(pb_file, EXPORT_DTYPES)
 
     pe_cols = [SYMBOL, NAME, PE]
     if 'EPS' in pe_df.columns:
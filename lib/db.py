@@ -0,0 +1,62 @@
+import atexit
+import threading
+from contextlib import contextmanager
+
+from psycopg2 import pool
+
+from lib import metrics
+
+# Database connection settings
+DB_NAME = "stocks"
+DB_HOST = "localhost"
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 8
+
+_pool: pool.ThreadedConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> pool.ThreadedConnectionPool:
+    """Process-wide connection pool (created on first use)."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = pool.ThreadedConnectionPool(
+                POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, dbname=DB_NAME, host=DB_HOST
+            )
+        return _pool
+
+
+@contextmanager
+def connection():
+    """
+    Borrow a pooled connection for one unit of work.
+    The time the connection is held is reported to lib.metrics as Postgres latency.
+
+    Commits when the block succeeds, rolls back when it raises, and always
+    returns the connection to the pool (discarding it if it was closed).
+    """
+    db_pool = get_pool()
+    with metrics.timed(metrics.SOURCE_POSTGRES):
+        conn = db_pool.getconn()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            if not conn.closed:
+                conn.rollback()
+            raise
+        finally:
+            db_pool.putconn(conn, close=bool(conn.closed))
+
+
+def close_pool() -> None:
+    """Close all pooled connections."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+
+atexit.register(close_pool)
@@ -1,10 +1,24 @@
+import threading
 import time
 import datetime as _dt
-import yfinance as yf
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
 
-from lib.irbank import try_irbank_fiscal_fields
+import pandas as pd
 
+from lib import metrics
+from lib.fetch_plan import TickerFetchPlan
+from lib.fundamentals import get_fundamentals_store
+from lib.irbank import dividend_first_and_gap_years, tokyo_numeric_code, try_irbank_fiscal_fields
+from lib.statements import LOOKBACK_YEARS, net_income_series, quote_summary_net_income
+
+# Postgres IRBANK bundle lifetime, counted from when its IRBANK page was fetched
 DIVIDEND_IRBANK_TTL = _dt.timedelta(days=90)
+# IRBANK pages fetched alongside the yfinance calls of the same symbol (see get_stock_info);
+# the IRBANK client itself caps requests in flight
+IRBANK_FETCH_WORKERS = 4
+
+_irbank_executor = ThreadPoolExecutor(max_workers=IRBANK_FETCH_WORKERS, thread_name_prefix="irbank")
 
 
 class SymbolNotFoundError(Exception):
@@ -27,172 +41,187 @@ def translate_symbol_for_yfinance(symbol: str) -> str:
     return symbol
 
 
-def get_assets_liabilities_ratio(symbol: str) -> float | None:
+def _assets_liabilities_ratio(balance_sheet) -> float | None:
+    """Total Assets / Total Liabilities from the latest balance sheet column, or None."""
+    if balance_sheet.empty:
+        return None
+
+    # Get most recent column (latest quarter/year)
+    latest = balance_sheet.iloc[:, 0]
+
+    total_assets = latest.get('Total Assets')
+    total_liabilities = latest.get('Total Liabilities Net Minority Interest')
+
+    if total_liabilities is None:
+        total_liabilities = latest.get('Total Liabilities')
+
+    if total_assets is not None and total_liabilities is not None and total_liabilities != 0:
+        return round(float(total_assets / total_liabilities), 2)
+
+    return None
+
+
+def _cash_covers_debt(balance_sheet) -> bool | None:
+    """Whether Cash + Receivables >= Total Debt on the latest balance sheet, or None."""
+    if balance_sheet.empty:
+        return None
+    latest = balance_sheet.iloc[:, 0]
+    # Use Cash & Short Term Investments (more comprehensive) as primary
+    cash = latest.get('Cash Cash Equivalents And Short Term Investments') or latest.get('Cash And Cash Equivalents')
+    # Sum all receivables types (treat None as 0)
+    accounts_recv = latest.get('Accounts Receivable') or 0
+    other_recv = latest.get('Other Receivables') or 0
+    receivables = accounts_recv + other_recv
+    total_debt = latest.get('Total Debt')
+
+    if cash is not None and total_debt is not None:
+        return bool((cash + receivables) >= total_debt)
+    return None
+
+
+def get_assets_liabilities_ratio(symbol: str, plan: TickerFetchPlan | None = None) -> float | None:
     """
     Fetch assets/liabilities ratio from yfinance balance sheet.
     
     Returns Total Assets / Total Liabilities, or None if unavailable.
+    Pass the symbol's TickerFetchPlan to reuse an already loaded balance sheet.
     """
     try:
-        yf_symbol = translate_symbol_for_yfinance(symbol)
-        ticker = yf.Ticker(yf_symbol)
-        balance_sheet = ticker.balance_sheet
-        
-        if balance_sheet.empty:
-            return None
-        
-        # Get most recent column (latest quarter/year)
-        latest = balance_sheet.iloc[:, 0]
-        
-        total_assets = latest.get('Total Assets')
-        total_liabilities = latest.get('Total Liabilities Net Minority Interest')
-        
-        if total_liabilities is None:
-            total_liabilities = latest.get('Total Liabilities')
-        
-        if total_assets is not None and total_liabilities is not None and total_liabilities != 0:
-            return round(float(total_assets / total_liabilities), 2)
-        
-        return None
+        if plan is None:
+            plan = TickerFetchPlan(translate_symbol_for_yfinance(symbol))
+        return _assets_liabilities_ratio(plan.balance_sheet)
     except Exception:
         return None
 
 
-def _detect_year_loss(ticker) -> int | None:
-    """Detect the most recent year with a net loss.
-
-    Returns:
-        int: Most recent year with a net loss (e.g. 2018)
-        0:   Checked successfully, no loss found
-        None: Could not determine
+def year_loss_from_statements(
+    yearly: pd.Series | None, quarterly: pd.Series | None
+) -> tuple[bool, int | None]:
     """
-    import pandas as pd
-
-    def _find_net_income_row(df):
-        preferred = ['NetIncome', 'Net Income', 'NetIncomeCommonStockholders', 'NetIncomeContinuousOperations']
-        for r in preferred:
-            if r in df.index:
-                return r
-        for idx in df.index:
-            s = str(idx).lower().replace(' ', '')
-            if 'netincome' in s or 'net income' in s:
-                return idx
-        return None
+    Loss year from annual and quarterly net income (quarterly can reveal losses
+    in years not in the annual window; quarters are summed per calendar year).
 
-    # Try yfinance: check both annual and quarterly (quarterly can reveal losses in years not in annual window)
-    import datetime as _dt
-    LOOKBACK_YEARS = 20
+    Returns (got_data, year_loss) with year_loss as in _detect_year_loss;
+    got_data is False when neither series exists.
+    """
     cutoff_year = _dt.date.today().year - LOOKBACK_YEARS
 
     got_data = False
     max_loss_year = None
     oldest_year_seen = None  # track how far back the data goes
 
-    for freq in ['yearly', 'quarterly']:
-        df = None
-        if hasattr(ticker, 'get_income_stmt'):
+    for freq, numeric in (('yearly', yearly), ('quarterly', quarterly)):
+        if numeric is None:
+            continue
+        got_data = True
+        try:
+            col_years = pd.to_datetime(numeric.index).year
+            oldest = int(col_years.min())
+            if oldest_year_seen is None or oldest < oldest_year_seen:
+                oldest_year_seen = oldest
+        except Exception:
+            pass
+        if freq == 'quarterly':
             try:
-                df = ticker.get_income_stmt(pretty=True, freq=freq)
+                years = pd.to_datetime(numeric.index).year
+                yearly_sum = numeric.groupby(years).sum()
+                loss_years = yearly_sum[yearly_sum < 0].index.tolist()
+                if loss_years:
+                    year = int(max(loss_years))
+                    if max_loss_year is None or year > max_loss_year:
+                        max_loss_year = year
             except Exception:
-                pass
-        if df is None or df.empty:
-            df = ticker.financials if freq == 'yearly' else getattr(ticker, 'quarterly_financials', pd.DataFrame())
-        if df is None:
-            df = pd.DataFrame()
-
-        if not df.empty:
-            row = _find_net_income_row(df)
-            if row is not None:
-                got_data = True
-                series = df.loc[row]
-                numeric = pd.to_numeric(series, errors='coerce')
+                loss_mask = numeric < 0
+                if loss_mask.any():
+                    try:
+                        loss_years = pd.to_datetime(numeric[loss_mask].index).year.tolist()
+                        year = int(max(loss_years))
+                        if max_loss_year is None or year > max_loss_year:
+                            max_loss_year = year
+                    except Exception:
+                        pass
+        else:
+            loss_mask = numeric < 0
+            if loss_mask.any():
                 try:
-                    col_years = pd.to_datetime(numeric.index).year
-                    oldest = int(col_years.min())
-                    if oldest_year_seen is None or oldest < oldest_year_seen:
-                        oldest_year_seen = oldest
+                    loss_years = pd.to_datetime(numeric[loss_mask].index).year.tolist()
+                    year = int(max(loss_years))
+                    if max_loss_year is None or year > max_loss_year:
+                        max_loss_year = year
                 except Exception:
                     pass
-                if freq == 'quarterly':
-                    try:
-                        years = pd.to_datetime(numeric.index).year
-                        yearly = numeric.groupby(years).sum()
-                        loss_years = yearly[yearly < 0].index.tolist()
-                        if loss_years:
-                            year = int(max(loss_years))
-                            if max_loss_year is None or year > max_loss_year:
-                                max_loss_year = year
-                    except Exception:
-                        loss_mask = numeric < 0
-                        if loss_mask.any():
-                            try:
-                                loss_years = pd.to_datetime(numeric[loss_mask].index).year.tolist()
-                                year = int(max(loss_years))
-                                if max_loss_year is None or year > max_loss_year:
-                                    max_loss_year = year
-                            except Exception:
-                                pass
-                else:
-                    loss_mask = numeric < 0
-                    if loss_mask.any():
-                        try:
-                            loss_years = pd.to_datetime(numeric[loss_mask].index).year.tolist()
-                            year = int(max(loss_years))
-                            if max_loss_year is None or year > max_loss_year:
-                                max_loss_year = year
-                        except Exception:
-                            pass
 
+    if not got_data:
+        return False, None
+    if max_loss_year is not None:
+        return True, max_loss_year
+    # Data found but no loss — only mark clean if coverage reaches the cutoff year
+    if oldest_year_seen is not None and oldest_year_seen <= cutoff_year:
+        return True, 0
+    return True, None  # data too recent to rule out older losses
+
+
+def year_loss_from_quote_summary(rows: list[tuple[int | None, float]]) -> tuple[bool, int | None]:
+    """Like year_loss_from_statements, for quote_summary_net_income rows."""
+    if not rows:
+        return False, None
+    cutoff_year = _dt.date.today().year - LOOKBACK_YEARS
+    fallback_max_loss_year = None
+    fallback_oldest_year = None
+    for year, raw in rows:
+        if year is None:
+            continue
+        if fallback_oldest_year is None or year < fallback_oldest_year:
+            fallback_oldest_year = year
+        if raw < 0:
+            if fallback_max_loss_year is None or year > fallback_max_loss_year:
+                fallback_max_loss_year = year
+    if fallback_max_loss_year is not None:
+        return True, fallback_max_loss_year
+    if fallback_oldest_year is not None and fallback_oldest_year <= cutoff_year:
+        return True, 0
+    return True, None  # data too recent to rule out older losses
+
+
+def _detect_year_loss(plan: TickerFetchPlan) -> int | None:
+    """Detect the most recent year with a net loss.
+
+    Returns:
+        int: Most recent year with a net loss (e.g. 2018)
+        0:   Checked successfully, no loss found
+        None: Could not determine
+    """
+    # Try yfinance: check both annual and quarterly
+    series = {}
+    for freq in ['yearly', 'quarterly']:
+        try:
+            series[freq] = net_income_series(plan.income_stmt(freq))
+        except Exception:
+            series[freq] = None
+    got_data, year_loss = year_loss_from_statements(series['yearly'], series['quarterly'])
     if got_data:
-        if max_loss_year is not None:
-            return max_loss_year
-        # Data found but no loss — only mark clean if coverage reaches the cutoff year
-        if oldest_year_seen is not None and oldest_year_seen <= cutoff_year:
-            return 0
-        return None  # data too recent to rule out older losses
+        return year_loss
 
     # Fallback: Yahoo quoteSummary API (works when timeseries returns empty, e.g. Canadian tickers)
     try:
-        data = getattr(ticker, '_data', None)
-        if data is not None and hasattr(data, 'cache_get'):
-            url = f"https://query2.finance.yahoo.com/v10/finance/quoteSummary/{ticker.ticker}?modules=incomeStatementHistory,incomeStatementHistoryQuarterly"
-            resp = data.cache_get(url=url)
-            if resp.status_code == 200:
-                js = resp.json()
-                result = js.get('quoteSummary', {}).get('result', [{}])
-                if result:
-                    found_any = False
-                    fallback_max_loss_year = None
-                    fallback_oldest_year = None
-                    for module in ['incomeStatementHistory', 'incomeStatementHistoryQuarterly']:
-                        mod_data = result[0].get(module, {})
-                        for stmt in mod_data.get('incomeStatementHistory', []):
-                            ni = stmt.get('netIncome')
-                            if isinstance(ni, dict):
-                                raw = ni.get('raw')
-                                if raw is not None:
-                                    found_any = True
-                                    end_date = stmt.get('endDate', {})
-                                    ts = end_date.get('raw') if isinstance(end_date, dict) else None
-                                    if ts is not None:
-                                        year = _dt.datetime.utcfromtimestamp(ts).year
-                                        if fallback_oldest_year is None or year < fallback_oldest_year:
-                                            fallback_oldest_year = year
-                                        if raw < 0:
-                                            if fallback_max_loss_year is None or year > fallback_max_loss_year:
-                                                fallback_max_loss_year = year
-                    if found_any:
-                        if fallback_max_loss_year is not None:
-                            return fallback_max_loss_year
-                        if fallback_oldest_year is not None and fallback_oldest_year <= cutoff_year:
-                            return 0
-                        return None  # data too recent to rule out older losses
+        resp = plan.quote_summary_income()
+        if resp is not None and resp.status_code == 200:
+            found_any, year_loss = year_loss_from_quote_summary(quote_summary_net_income(resp.json()))
+            if found_any:
+                return year_loss
     except Exception:
         pass
 
     return None
 
 
+def yfinance_first_and_gap_years(divs: pd.Series) -> tuple[int | None, int | None]:
+    """first_div_year / last_no_div_year from a yfinance dividend series (any payment counts)."""
+    if len(divs) == 0:
+        return None, None
+    return dividend_first_and_gap_years([(year, 1.0) for year in sorted(set(divs.index.year))])
+
+
 def _use_pg_dividend_bundle(pg: dict | None) -> bool:
     """True when dividend fields should come from Postgres (skip IRBANK / yfinance dividend fetch)."""
     if not pg:
@@ -207,9 +236,38 @@ def _use_pg_dividend_bundle(pg: dict | None) -> bool:
     return False
 
 
-def get_stock_info(symbol: str, dividend_pg_bundle: dict | None = None) -> dict:
+def _empty_stock_info() -> dict:
+    return {
+        "first_div_year": None,
+        "last_no_div_year": None,
+        "AL_ratio": None,
+        "year_loss": None,
+        "current_ratio": None,
+        "cash_debt_ok": None
+    }
+
+
+def get_stock_info(
+    symbol: str,
+    dividend_pg_bundle: dict | None = None,
+    fetch_plan: TickerFetchPlan | None = None,
+    stop: Callable[[dict], bool] | None = None,
+) -> dict:
     """
     Fetch financial information for a symbol.
+
+    Every yfinance dataset is loaded at most once through a TickerFetchPlan;
+    pass fetch_plan to inspect which upstream calls were made (plan.calls).
+
+    Fields are filled cheapest first: info (current_ratio), dividends (plus
+    the IRBANK loss year from the same page), yfinance year_loss, balance
+    sheet (AL_ratio, cash_debt_ok). When `stop` returns True for the partial
+    result after a stage, the remaining stages are skipped and their fields
+    stay None.
+
+    For .T symbols the IRBANK page is requested up front on a background
+    thread, so it downloads while yfinance info loads; its fields are merged
+    at the dividend stage with the same precedence as before.
     
     Returns dict with:
         - first_div_year: Year of first dividend (int or None)
@@ -219,29 +277,27 @@ def get_stock_info(symbol: str, dividend_pg_bundle: dict | None = None) -> dict:
         - current_ratio: Current Ratio from yfinance (float or None)
         - cash_debt_ok: Whether Cash + Receivables >= Total Debt (bool or None)
     """
-    result = {
-        "first_div_year": None,
-        "last_no_div_year": None,
-        "AL_ratio": None,
-        "year_loss": None,
-        "current_ratio": None,
-        "cash_debt_ok": None
-    }
+    result = _empty_stock_info()
     
     yf_symbol = translate_symbol_for_yfinance(symbol)
-    
+    irbank_future = (
+        _irbank_executor.submit(try_irbank_fiscal_fields, symbol) if tokyo_numeric_code(symbol) else None
+    )
+
     try:
-        ticker = yf.Ticker(yf_symbol)
+        plan = fetch_plan if fetch_plan is not None else TickerFetchPlan(yf_symbol)
         
         # Check if symbol is valid by trying to get info first
-        info = ticker.info
+        info = plan.info
         # If info is empty or only has minimal fields, symbol likely doesn't exist
         if not info or len(info) <= 1 or info.get('trailingPegRatio') is None and info.get('regularMarketPrice') is None and info.get('previousClose') is None:
             # Check balance sheet as backup
-            balance_sheet = ticker.balance_sheet
-            financials = ticker.financials
-            if balance_sheet.empty and financials.empty:
+            if plan.balance_sheet.empty and plan.financials.empty:
                 raise SymbolNotFoundError(f"Symbol {symbol} not found or delisted")
+
+        # Get current ratio from info
+        if info and 'currentRatio' in info and info['currentRatio'] is not None:
+            result["current_ratio"] = round(float(info['currentRatio']), 2)
         
         # Dividend history: PG bundle if verified or unexpired irbank; else IRBANK then yfinance
         using_pg_dividend_bundle = bool(
@@ -252,8 +308,8 @@ def get_stock_info(symbol: str, dividend_pg_bundle: dict | None = None) -> dict:
             result["last_no_div_year"] = dividend_pg_bundle.get("last_no_div_year")
             result["year_loss"] = dividend_pg_bundle.get("year_loss")
             # Postgres bundle predates IRBANK 会社業績; refresh loss year from the same page as dividends.
-            if symbol.endswith(".T"):
-                ir_supp = try_irbank_fiscal_fields(symbol)
+            if irbank_future is not None:
+                ir_supp = irbank_future.result()
                 if ir_supp is not None and ir_supp["year_loss"] is not None:
                     pg_y = result["year_loss"]
                     ir_y = ir_supp["year_loss"]
@@ -264,72 +320,46 @@ def get_stock_info(symbol: str, dividend_pg_bundle: dict | None = None) -> dict:
                         result["year_loss"] = 0
                     if ir_supp["first_div_year"] is not None or ir_supp["year_loss"] is not None:
                         result["dividend_data_source"] = "irbank"
-                        result["dividend_cache_expires_at"] = (
-                            _dt.datetime.now(_dt.timezone.utc) + DIVIDEND_IRBANK_TTL
-                        )
+                        result["dividend_cache_expires_at"] = ir_supp["fetched_at"] + DIVIDEND_IRBANK_TTL
         else:
-            ir = try_irbank_fiscal_fields(symbol)
-            divs = ticker.dividends
+            ir = irbank_future.result() if irbank_future is not None else None
             if ir is not None and ir["first_div_year"] is not None:
                 result["first_div_year"] = ir["first_div_year"]
                 result["last_no_div_year"] = ir["last_no_div_year"]
             else:
+                # yfinance dividends are only needed when IRBANK has no dividend table
+                divs = plan.dividends
                 if len(divs) > 0:
-                    first_year = divs.index.min().year
-                    last_year = divs.index.max().year
-                    result["first_div_year"] = first_year
-
-                    dividend_years = set(divs.index.year)
-                    cutoff_year = _dt.date.today().year - 20
-                    check_start = max(first_year, cutoff_year)
-                    if last_year > check_start:
-                        expected_years = set(range(check_start, last_year + 1))
-                        missing_years = expected_years - dividend_years
-                        if missing_years:
-                            result["last_no_div_year"] = max(missing_years)
-                        else:
-                            result["last_no_div_year"] = 0
-                    else:
-                        result["last_no_div_year"] = 0
+                    result["first_div_year"], result["last_no_div_year"] = yfinance_first_and_gap_years(divs)
 
             if ir is not None and ir["year_loss"] is not None:
                 result["year_loss"] = ir["year_loss"]
-            else:
-                result["year_loss"] = _detect_year_loss(ticker)
 
             irbank_snapshot = ir is not None and (
                 ir["first_div_year"] is not None or ir["year_loss"] is not None
             )
             if irbank_snapshot:
                 result["dividend_data_source"] = "irbank"
-                result["dividend_cache_expires_at"] = (
-                    _dt.datetime.now(_dt.timezone.utc) + DIVIDEND_IRBANK_TTL
-                )
+                result["dividend_cache_expires_at"] = ir["fetched_at"] + DIVIDEND_IRBANK_TTL
             elif (ir is None or ir["first_div_year"] is None) and len(divs) > 0:
                 result["dividend_data_source"] = "yfinance"
                 result["dividend_cache_expires_at"] = None
 
-        # Get assets/liabilities ratio
-        result["AL_ratio"] = get_assets_liabilities_ratio(symbol)
-        
-        # Get current ratio from info
-        if info and 'currentRatio' in info and info['currentRatio'] is not None:
-            result["current_ratio"] = round(float(info['currentRatio']), 2)
+            if stop is not None and stop(result):
+                return result
+
+            # yfinance income statements (annual, quarterly, quoteSummary fallback)
+            if ir is None or ir["year_loss"] is None:
+                result["year_loss"] = _detect_year_loss(plan)
+
+        if stop is not None and stop(result):
+            return result
+
+        # Get assets/liabilities ratio (same balance sheet as cash_debt_ok below)
+        result["AL_ratio"] = get_assets_liabilities_ratio(symbol, plan)
         
         # Check if Cash + Receivables >= Total Debt
-        balance_sheet = ticker.balance_sheet
-        if not balance_sheet.empty:
-            latest = balance_sheet.iloc[:, 0]
-            # Use Cash & Short Term Investments (more comprehensive) as primary
-            cash = latest.get('Cash Cash Equivalents And Short Term Investments') or latest.get('Cash And Cash Equivalents')
-            # Sum all receivables types (treat None as 0)
-            accounts_recv = latest.get('Accounts Receivable') or 0
-            other_recv = latest.get('Other Receivables') or 0
-            receivables = accounts_recv + other_recv
-            total_debt = latest.get('Total Debt')
-            
-            if cash is not None and total_debt is not None:
-                result["cash_debt_ok"] = bool((cash + receivables) >= total_debt)
+        result["cash_debt_ok"] = _cash_covers_debt(plan.balance_sheet)
         
     except SymbolNotFoundError:
         raise
@@ -337,7 +367,11 @@ def get_stock_info(symbol: str, dividend_pg_bundle: dict | None = None) -> dict:
         error_str = str(e)
         if '404' in error_str or 'Not Found' in error_str or 'Quote not found' in error_str:
             raise SymbolNotFoundError(f"Symbol {symbol} not found: {error_str}")
-    
+    finally:
+        # Not found / stopped before the dividend stage: drop the fetch if it has not started
+        if irbank_future is not None:
+            irbank_future.cancel()
+
     return result
 
 
@@ -361,46 +395,73 @@ def get_stock_info_batch(
     delay: float = 0.2,
     names: dict[str, str] | None = None,
     pg_dividend_cache: dict[str, dict] | None = None,
+    max_workers: int = 1,
+    stop: Callable[[dict], bool] | None = None,
+    cancel: threading.Event | None = None,
 ) -> tuple[dict[str, dict], list[str]]:
     """
     Fetch full stock info for multiple symbols.
     
     Args:
         symbols: List of stock symbols
-        delay: Delay between API calls in seconds
+        delay: Delay between symbols in seconds when fetching serially (every
+            Yahoo request is also spaced process-wide, see lib.http_cache)
         names: Optional dict mapping symbol to company name for better error messages
         pg_dividend_cache: Optional dict company_name -> row from get_stock_info_cache (dividend TTL / verified)
+        max_workers: Number of symbols fetched concurrently (1 = serial)
+        stop: Optional early-exit predicate passed to get_stock_info
+        cancel: Optional event; once set, symbols not yet started are skipped
+            (they get empty info, so the results of a cancelled batch must be discarded)
     
     Returns:
         Tuple of:
-        - Dictionary mapping symbol to stock info dict
+        - Dictionary mapping symbol to stock info dict (in input order)
         - List of symbols that returned 404 (not found)
     """
-    result = {}
-    not_found = []
-    for i, symbol in enumerate(symbols):
+    fundamentals = get_fundamentals_store()
+
+    def fetch_one(symbol: str) -> tuple[dict, bool]:
+        if cancel is not None and cancel.is_set():
+            return _empty_stock_info(), False
         try:
             div_bundle = None
             if names and pg_dividend_cache:
                 cname = names.get(symbol)
                 if cname:
                     div_bundle = pg_dividend_cache.get(cname)
-            result[symbol] = get_stock_info(symbol, dividend_pg_bundle=div_bundle)
+            plan = TickerFetchPlan(translate_symbol_for_yfinance(symbol))
+            with metrics.timed(metrics.SOURCE_SYMBOL_TOTAL):
+                info = get_stock_info(symbol, dividend_pg_bundle=div_bundle, fetch_plan=plan, stop=stop)
+            # Keep the raw statements / dividends for offline recompute (lib.fundamentals)
+            fundamentals.record_plan(symbol, plan)
+            return info, False
         except SymbolNotFoundError:
+            metrics.incr(metrics.SYMBOL_NOT_FOUND)
             name = names.get(symbol, '') if names else ''
             name_str = f" ({name})" if name else ""
             print(f"  -> {symbol}{name_str}: quote not found")
+            return _empty_stock_info(), True
+
+    fetched: dict[str, tuple[dict, bool]] = {}
+    if max_workers <= 1:
+        for i, symbol in enumerate(symbols):
+            fetched[symbol] = fetch_one(symbol)
+            if i < len(symbols) - 1 and not (cancel is not None and cancel.is_set()):
+                time.sleep(delay)
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for symbol, outcome in zip(symbols, executor.map(fetch_one, symbols)):
+                fetched[symbol] = outcome
+
+    fundamentals.flush()
+
+    result = {}
+    not_found = []
+    for symbol in symbols:
+        info, missing = fetched[symbol]
+        result[symbol] = info
+        if missing:
             not_found.append(symbol)
-            result[symbol] = {
-                "first_div_year": None,
-                "last_no_div_year": None,
-                "AL_ratio": None,
-                "year_loss": None,
-                "current_ratio": None,
-                "cash_debt_ok": None
-            }
-        if i < len(symbols) - 1:
-            time.sleep(delay)
     return result, not_found
 
 
@@ -0,0 +1,95 @@
+import time
+
+import pandas as pd
+import yfinance as yf
+
+from lib import metrics
+from lib.http_cache import get_yfinance_session
+
+QUOTE_SUMMARY_INCOME_URL = (
+    "https://query2.finance.yahoo.com/v10/finance/quoteSummary/{symbol}"
+    "?modules=incomeStatementHistory,incomeStatementHistoryQuarterly"
+)
+
+# Latency source (lib.metrics) per dataset key
+_METRIC_SOURCES = {
+    "info": metrics.SOURCE_YF_INFO,
+    "balance_sheet": metrics.SOURCE_YF_BALANCE_SHEET,
+    "dividends": metrics.SOURCE_YF_DIVIDENDS,
+    "quote_summary_income": metrics.SOURCE_YF_QUOTE_SUMMARY,
+}
+
+
+class TickerFetchPlan:
+    """
+    Per-symbol, lazy view of the yfinance data behind get_stock_info.
+    Requests go through the shared caching session (lib.http_cache).
+
+    Each upstream dataset (info, balance sheet, income statements, dividends,
+    quoteSummary income history) is requested the first time a derived field
+    needs it and reused afterwards, so nothing is downloaded twice. Failed
+    loads are remembered too and re-raised instead of retried.
+
+    `calls` lists the upstream requests actually made, in order, and
+    `timings` their wall time in seconds (also reported to lib.metrics).
+    """
+
+    def __init__(self, yf_symbol: str):
+        self.symbol = yf_symbol
+        self.ticker = yf.Ticker(yf_symbol, session=get_yfinance_session())
+        self.calls: list[str] = []
+        self.timings: dict[str, float] = {}
+        self._loaded: dict[str, object] = {}
+        self._errors: dict[str, Exception] = {}
+
+    def _load(self, key: str, fetch):
+        if key in self._errors:
+            raise self._errors[key]
+        if key not in self._loaded:
+            self.calls.append(key)
+            start = time.perf_counter()
+            try:
+                self._loaded[key] = fetch()
+            except Exception as e:
+                self._errors[key] = e
+                raise
+            finally:
+                self.timings[key] = time.perf_counter() - start
+                metrics.record(_METRIC_SOURCES.get(key, metrics.SOURCE_YF_INCOME_STMT), self.timings[key])
+        return self._loaded[key]
+
+    def peek(self, key: str):
+        """Dataset already loaded under key (e.g. "balance_sheet", "income_stmt:yearly"), or None; never fetches."""
+        return self._loaded.get(key)
+
+    @property
+    def info(self) -> dict:
+        return self._load("info", lambda: self.ticker.info)
+
+    @property
+    def balance_sheet(self) -> pd.DataFrame:
+        return self._load("balance_sheet", lambda: self.ticker.balance_sheet)
+
+    def income_stmt(self, freq: str = "yearly") -> pd.DataFrame:
+        """Income statement ('yearly' or 'quarterly'); same data as ticker.financials / quarterly_financials."""
+        return self._load(
+            f"income_stmt:{freq}",
+            lambda: self.ticker.get_income_stmt(pretty=True, freq=freq),
+        )
+
+    @property
+    def financials(self) -> pd.DataFrame:
+        return self.income_stmt("yearly")
+
+    @property
+    def dividends(self) -> pd.Series:
+        return self._load("dividends", lambda: self.ticker.dividends)
+
+    def quote_summary_income(self):
+        """Raw quoteSummary income-statement response, or None when yfinance exposes no data client."""
+        def fetch():
+            data = getattr(self.ticker, "_data", None)
+            if data is None or not hasattr(data, "cache_get"):
+                return None
+            return data.cache_get(url=QUOTE_SUMMARY_INCOME_URL.format(symbol=self.ticker.ticker))
+        return self._load("quote_summary_income", fetch)
@@ -0,0 +1,469 @@
+"""
+Local columnar store of the raw fundamentals behind get_stock_info.
+
+The fetch layers reduce income statements, balance sheets and dividend
+histories to a handful of integers; this store keeps the underlying rows
+(Parquet, keyed by symbol + source + period) so the derived fields can be
+recomputed offline for the whole universe, e.g. when the lookback rules
+change.
+
+Tables:
+    income         symbol, source, period_end, year, net_income, is_loss
+                   source: yearly | quarterly | quote_summary (yfinance), irbank
+    balance_sheet  symbol, source, period_end, <BALANCE_SHEET_LINES>
+    dividends      symbol, source, year, ex_date, amount
+                   source: yfinance (one row per payment), irbank (per fiscal year)
+
+Rows are replaced per (symbol, source) whenever that dataset is fetched
+again, so the store is updated incrementally by normal screener runs: each
+flush writes one small part file per table (<table>/part-*.parquet) with
+the new rows, and compact() folds the parts into <table>.parquet at the end
+of the run (or as soon as a table has more than MAX_PARTS parts). Compaction
+holds an exclusive lock on the store directory, so a screener and a prewarm
+process can share it. Needs pyarrow; without it recording is a no-op.
+"""
+
+import atexit
+import datetime as _dt
+import fcntl
+import glob
+import itertools
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+from lib.statements import LOOKBACK_YEARS, net_income_series, quote_summary_net_income
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+STORE_DIR = os.path.join(REPO_ROOT, ".cache", "fundamentals")
+
+# Part files per table before flush() compacts it (long-running processes never exit)
+MAX_PARTS = 64
+
+INCOME = "income"
+BALANCE_SHEET = "balance_sheet"
+DIVIDENDS = "dividends"
+
+# Balance sheet line -> column
+BALANCE_SHEET_LINES = {
+    'Total Assets': 'total_assets',
+    'Total Liabilities Net Minority Interest': 'total_liabilities_nmi',
+    'Total Liabilities': 'total_liabilities',
+    'Cash Cash Equivalents And Short Term Investments': 'cash_sti',
+    'Cash And Cash Equivalents': 'cash',
+    'Accounts Receivable': 'accounts_receivable',
+    'Other Receivables': 'other_receivables',
+    'Total Debt': 'total_debt',
+}
+
+TABLE_COLUMNS = {
+    INCOME: ['symbol', 'source', 'period_end', 'year', 'net_income', 'is_loss'],
+    BALANCE_SHEET: ['symbol', 'source', 'period_end', *BALANCE_SHEET_LINES.values()],
+    DIVIDENDS: ['symbol', 'source', 'year', 'ex_date', 'amount'],
+}
+
+_TABLE_DTYPES = {
+    INCOME: {'year': 'Int64', 'net_income': 'float64', 'is_loss': 'boolean'},
+    BALANCE_SHEET: {col: 'float64' for col in BALANCE_SHEET_LINES.values()},
+    DIVIDENDS: {'year': 'Int64', 'amount': 'float64'},
+}
+
+
+def _frame(table: str, rows: list[dict]) -> pd.DataFrame:
+    df = pd.DataFrame(rows, columns=TABLE_COLUMNS[table])
+    for col in ('period_end', 'ex_date'):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col]).astype('datetime64[ns]')
+    df = df.astype(_TABLE_DTYPES[table])
+    df['symbol'] = df['symbol'].astype(str)
+    df['source'] = df['source'].astype(str)
+    return df
+
+
+# Part file metadata: the (symbol, source) pairs whose earlier rows the part replaces
+_REPLACED_METADATA = b"replaced"
+_part_seq = itertools.count()
+
+
+def _without(df: pd.DataFrame, keys: set[tuple[str, str]]) -> pd.DataFrame:
+    """Rows of df whose (symbol, source) is not in keys."""
+    if not keys or df.empty:
+        return df
+    return df[~pd.MultiIndex.from_frame(df[['symbol', 'source']]).isin(list(keys))]
+
+
+def _naive(ts) -> pd.Timestamp:
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize(None) if ts.tzinfo is not None else ts
+
+
+class FundamentalsStore:
+    """
+    Buffered writer / reader for the fundamentals tables under path.
+
+    record_* calls only buffer rows (thread-safe); flush() writes them as a
+    new part file per table, which replaces earlier rows of the same
+    (symbol, source) when the table is loaded. compact() merges the parts
+    into one file per table.
+    """
+
+    def __init__(self, path: str = STORE_DIR):
+        self.path = path
+        self._pending: dict[str, list[pd.DataFrame]] = {table: [] for table in TABLE_COLUMNS}
+        self._replace: dict[str, set[tuple[str, str]]] = {table: set() for table in TABLE_COLUMNS}
+        self._lock = threading.Lock()
+
+    def _file(self, table: str) -> str:
+        return os.path.join(self.path, f"{table}.parquet")
+
+    @contextmanager
+    def _dir_lock(self, mode: int):
+        """Inter-process lock on the store directory: fcntl.LOCK_EX to compact, LOCK_SH to read."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, ".lock"), "a") as f:
+            fcntl.flock(f, mode)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _parts(self, table: str) -> list[str]:
+        """Part files of table, oldest first."""
+        return sorted(glob.glob(os.path.join(self.path, table, "part-*.parquet")))
+
+    def _add(self, table: str, symbol: str, source: str, rows: list[dict]) -> None:
+        if not PARQUET_AVAILABLE:
+            return
+        df = _frame(table, rows)
+        with self._lock:
+            self._replace[table].add((symbol, source))
+            self._pending[table].append(df)
+
+    # --- recording ----------------------------------------------------------
+
+    def record_plan(self, symbol: str, plan) -> None:
+        """Record whatever a TickerFetchPlan loaded for symbol (nothing is fetched here)."""
+        for freq in ('yearly', 'quarterly'):
+            df = plan.peek(f"income_stmt:{freq}")
+            if df is None:
+                continue
+            series = net_income_series(df)
+            rows = []
+            if series is not None:
+                for period_end, value in series.items():
+                    rows.append({
+                        'symbol': symbol, 'source': freq, 'period_end': _naive(period_end),
+                        'year': _naive(period_end).year, 'net_income': value,
+                        'is_loss': bool(value < 0) if pd.notna(value) else False,
+                    })
+            self._add(INCOME, symbol, freq, rows)
+
+        resp = plan.peek("quote_summary_income")
+        if resp is not None and resp.status_code == 200:
+            try:
+                qs_rows = quote_summary_net_income(resp.json())
+            except Exception:
+                qs_rows = None
+            if qs_rows is not None:
+                self._add(INCOME, symbol, 'quote_summary', [
+                    {'symbol': symbol, 'source': 'quote_summary', 'period_end': None,
+                     'year': year, 'net_income': raw, 'is_loss': raw < 0}
+                    for year, raw in qs_rows
+                ])
+
+        balance_sheet = plan.peek("balance_sheet")
+        if balance_sheet is not None:
+            rows = []
+            for period_end in balance_sheet.columns:
+                column = balance_sheet[period_end]
+                row = {'symbol': symbol, 'source': 'yfinance', 'period_end': _naive(period_end)}
+                for line, col in BALANCE_SHEET_LINES.items():
+                    row[col] = column.get(line)
+                rows.append(row)
+            self._add(BALANCE_SHEET, symbol, 'yfinance', rows)
+
+        divs = plan.peek("dividends")
+        if divs is not None:
+            self._add(DIVIDENDS, symbol, 'yfinance', [
+                {'symbol': symbol, 'source': 'yfinance', 'year': _naive(ex_date).year,
+                 'ex_date': _naive(ex_date), 'amount': amount}
+                for ex_date, amount in divs.items()
+            ])
+
+    def record_irbank(
+        self,
+        symbol: str,
+        dividend_rows: list[tuple[int, float | None]],
+        loss_rows: list[tuple[int, bool | None]] | None,
+    ) -> None:
+        """Record one parsed IRBANK 決算まとめ page (配当 rows and 会社業績 loss flags)."""
+        self._add(DIVIDENDS, symbol, 'irbank', [
+            {'symbol': symbol, 'source': 'irbank', 'year': year, 'ex_date': None, 'amount': dps}
+            for year, dps in dividend_rows
+        ])
+        self._add(INCOME, symbol, 'irbank', [
+            {'symbol': symbol, 'source': 'irbank', 'period_end': None, 'year': year,
+             'net_income': None, 'is_loss': is_loss}
+            for year, is_loss in (loss_rows or [])
+        ])
+
+    # --- persistence --------------------------------------------------------
+
+    def _merge(self, table: str, parts: list[str]) -> pd.DataFrame:
+        """The table file with parts applied in order (a part replaces earlier rows of its keys)."""
+        path = self._file(table)
+        base = pd.read_parquet(path) if os.path.exists(path) else _frame(table, [])
+        if not parts:
+            return base
+        frames, keys = [], []
+        for i, part in enumerate(parts):
+            part_table = pq.read_table(part)
+            frames.append(part_table.to_pandas().assign(_part=i))
+            replaced = json.loads(part_table.schema.metadata[_REPLACED_METADATA])
+            keys.extend((symbol, source, i) for symbol, source in replaced)
+        # Newest part per (symbol, source); only its rows survive
+        latest = pd.DataFrame(keys, columns=['symbol', 'source', '_part']).groupby(['symbol', 'source'])['_part'].max()
+        rows = pd.concat(frames, ignore_index=True)
+        row_keys = pd.MultiIndex.from_frame(rows[['symbol', 'source']])
+        rows = rows[rows['_part'].to_numpy() == latest.reindex(row_keys).to_numpy()].drop(columns='_part')
+        merged = pd.concat([_without(base, set(latest.index)), rows], ignore_index=True)
+        return merged.sort_values(['symbol', 'source'], kind='stable', ignore_index=True)
+
+    def load(self, table: str) -> pd.DataFrame:
+        """Stored rows of table (empty frame when nothing was stored yet)."""
+        if not PARQUET_AVAILABLE:
+            return _frame(table, [])
+        with self._dir_lock(fcntl.LOCK_SH):
+            return self._merge(table, self._parts(table))
+
+    def flush(self) -> None:
+        """Write buffered rows as one new part file per table (costs O(buffered rows))."""
+        if not PARQUET_AVAILABLE:
+            return
+        with self._lock:
+            pending, self._pending = self._pending, {table: [] for table in TABLE_COLUMNS}
+            replace, self._replace = self._replace, {table: set() for table in TABLE_COLUMNS}
+            crowded = []
+            for table, frames in pending.items():
+                if not replace[table]:
+                    continue
+                rows = pd.concat(frames, ignore_index=True)
+                part_table = pa.Table.from_pandas(rows, preserve_index=False)
+                part_table = part_table.replace_schema_metadata({
+                    **(part_table.schema.metadata or {}),
+                    _REPLACED_METADATA: json.dumps(sorted(replace[table])),
+                })
+                part_dir = os.path.join(self.path, table)
+                os.makedirs(part_dir, exist_ok=True)
+                name = f"part-{time.time_ns():020d}-{os.getpid()}-{next(_part_seq):06d}.parquet"
+                tmp = os.path.join(part_dir, name + ".tmp")
+                pq.write_table(part_table, tmp)
+                os.replace(tmp, os.path.join(part_dir, name))
+                if len(self._parts(table)) > MAX_PARTS:
+                    crowded.append(table)
+            if crowded:
+                self._compact_tables(crowded)
+
+    def compact(self) -> None:
+        """Flush, then fold each table's part files into its single Parquet file."""
+        if not PARQUET_AVAILABLE:
+            return
+        self.flush()
+        with self._lock:
+            self._compact_tables(list(TABLE_COLUMNS))
+
+    def _compact_tables(self, tables: list[str]) -> None:
+        """Fold the part files of tables into their table files (self._lock held)."""
+        with self._dir_lock(fcntl.LOCK_EX):
+            for table in tables:
+                parts = self._parts(table)
+                if not parts:
+                    continue
+                merged = self._merge(table, parts)
+                fd, tmp = tempfile.mkstemp(prefix=f"{table}.", suffix=".tmp", dir=self.path)
+                os.close(fd)
+                try:
+                    merged.to_parquet(tmp, index=False)
+                    os.replace(tmp, self._file(table))
+                except BaseException:
+                    os.remove(tmp)
+                    raise
+                for part in parts:
+                    try:
+                        os.remove(part)
+                    except FileNotFoundError:
+                        pass
+
+    # --- offline recompute --------------------------------------------------
+
+    def recompute(self, symbols: list[str] | None = None) -> pd.DataFrame:
+        """
+        Derived get_stock_info fields per symbol from stored rows only (no network).
+
+        Same source precedence as a fresh get_stock_info fetch: IRBANK dividend
+        table and loss year first, then yfinance statements / dividends, then the
+        quoteSummary income fallback. AL_ratio and cash_debt_ok use the latest
+        balance sheet period; missing and NaN lines are treated alike.
+        """
+        income = self.load(INCOME)
+        dividends = self.load(DIVIDENDS)
+        balance = self.load(BALANCE_SHEET)
+        if symbols is not None:
+            wanted = set(symbols)
+            income = income[income['symbol'].isin(wanted)]
+            dividends = dividends[dividends['symbol'].isin(wanted)]
+            balance = balance[balance['symbol'].isin(wanted)]
+        all_symbols = pd.Index(
+            sorted(set(income['symbol']) | set(dividends['symbol']) | set(balance['symbol'])), name='symbol'
+        )
+
+        # Dividends: IRBANK table when it yields a first dividend year, else any yfinance payment
+        ir_div = batch_dividend_years(dividends[dividends['source'] == 'irbank'])
+        ir_div = ir_div[ir_div['first_div_year'].notna()]
+        yf_rows = dividends[dividends['source'] == 'yfinance'].assign(amount=1.0)
+        yf_div = batch_dividend_years(yf_rows)
+        div = yf_div[~yf_div.index.isin(ir_div.index)]
+        div = pd.concat([ir_div, div]).reindex(all_symbols)
+
+        # Loss year: IRBANK 会社業績, else annual + quarterly statements, else quoteSummary
+        ir_loss = batch_year_loss(
+            income.loc[income['source'] == 'irbank', ['symbol', 'year']].assign(
+                net_income=income.loc[income['source'] == 'irbank', 'is_loss'].map({True: -1.0}).fillna(1.0)
+            ),
+            require_coverage=False,
+        )
+        statement_rows = income[income['source'].isin(['yearly', 'quarterly'])]
+        yearly_rows = statement_rows[statement_rows['source'] == 'yearly'][['symbol', 'year', 'net_income']]
+        # Quarters count per calendar year (NaN quarters add nothing)
+        quarterly_rows = (
+            statement_rows[statement_rows['source'] == 'quarterly']
+            .groupby(['symbol', 'year'], as_index=False)['net_income'].sum()
+        )
+        stmt_loss = batch_year_loss(pd.concat([yearly_rows, quarterly_rows], ignore_index=True))
+        qs_rows = income[(income['source'] == 'quote_summary') & income['year'].notna()]
+        qs_loss = batch_year_loss(qs_rows[['symbol', 'year', 'net_income']])
+
+        has_statements = all_symbols.isin(statement_rows['symbol'])
+        year_loss = ir_loss.reindex(all_symbols)
+        fallback = pd.Series(
+            stmt_loss.reindex(all_symbols).where(has_statements, qs_loss.reindex(all_symbols)),
+            index=all_symbols,
+        )
+        year_loss = year_loss.fillna(fallback)
+
+        result = pd.DataFrame({
+            'year_loss': year_loss.astype('Int64'),
+            'first_div_year': div['first_div_year'].astype('Int64'),
+            'last_no_div_year': div['last_no_div_year'].astype('Int64'),
+        }, index=all_symbols)
+        return result.join(balance_sheet_ratios(balance), how='left')
+
+
+def batch_year_loss(
+    net_income: pd.DataFrame, require_coverage: bool = True, today_year: int | None = None
+) -> pd.Series:
+    """
+    Most recent loss year per symbol from long-format (symbol, year, net_income) rows,
+    one row per annual figure (sum quarters per year first).
+
+    Matches the scalar year_loss_from_statements / year_loss_from_pl_rows:
+    the latest year with a negative figure; otherwise 0 when the data reaches
+    back to the LOOKBACK_YEARS cutoff (or always, with require_coverage=False);
+    otherwise NA. Symbols without rows are absent.
+    """
+    if net_income.empty:
+        return pd.Series(dtype='Int64', index=pd.Index([], name='symbol'), name='year_loss')
+
+    cutoff_year = (today_year or _dt.date.today().year) - LOOKBACK_YEARS
+    years = net_income['year'].astype('int64')
+    grouped = years.groupby(net_income['symbol'])
+    oldest = grouped.min()
+    loss_years = years.where(net_income['net_income'] < 0)
+    last_loss = loss_years.groupby(net_income['symbol']).max()
+    clean = pd.Series(0, index=oldest.index)
+    if require_coverage:
+        clean = clean.where(oldest <= cutoff_year)
+    return last_loss.fillna(clean).astype('Int64').rename('year_loss').rename_axis('symbol')
+
+
+def batch_dividend_years(dividends: pd.DataFrame, today_year: int | None = None) -> pd.DataFrame:
+    """
+    first_div_year / last_no_div_year per symbol from long-format (symbol, year, amount)
+    rows; matches lib.irbank.dividend_first_and_gap_years (a year counts when its
+    amount is > 0). Symbols without any such year are absent.
+
+    A gap between consecutive dividend years y_prev < y_next misses y_prev+1 ..
+    y_next-1, so the latest missing year in the window [check_start, last year]
+    is the largest y_next-1 >= check_start over all gaps, and 0 without one.
+    """
+    cutoff_year = (today_year or _dt.date.today().year) - LOOKBACK_YEARS
+    paid = dividends.loc[dividends['amount'] > 0, ['symbol', 'year']].astype({'year': 'int64'})
+    if paid.empty:
+        return pd.DataFrame(
+            {'first_div_year': pd.Series(dtype='Int64'), 'last_no_div_year': pd.Series(dtype='Int64')},
+            index=pd.Index([], name='symbol'),
+        )
+    paid = paid.drop_duplicates().sort_values(['symbol', 'year'], kind='stable')
+    symbol = paid['symbol']
+    year = paid['year']
+    first = year.groupby(symbol).min()
+    check_start = first.clip(lower=cutoff_year)
+
+    prev_year = year.groupby(symbol).shift()
+    gap_end = (year - 1).where(year - prev_year > 1)
+    gap_end = gap_end.where(gap_end >= symbol.map(check_start))
+    last_gap = gap_end.groupby(symbol).max()
+
+    return pd.DataFrame({
+        'first_div_year': first.astype('Int64'),
+        'last_no_div_year': last_gap.reindex(first.index).fillna(0).astype('Int64'),
+    }).rename_axis('symbol')
+
+
+def balance_sheet_ratios(balance: pd.DataFrame) -> pd.DataFrame:
+    """AL_ratio and cash_debt_ok per symbol from the latest stored balance sheet period."""
+    if balance.empty:
+        return pd.DataFrame(
+            {'AL_ratio': pd.Series(dtype='float64'), 'cash_debt_ok': pd.Series(dtype='boolean')},
+            index=pd.Index([], name='symbol'),
+        )
+    latest = balance.sort_values('period_end').groupby('symbol').tail(1).set_index('symbol')
+    liabilities = latest['total_liabilities_nmi'].fillna(latest['total_liabilities'])
+    assets = latest['total_assets']
+    al_ok = assets.notna() & liabilities.notna() & (liabilities != 0)
+    al_ratio = (assets / liabilities).round(2).where(al_ok)
+
+    # Cash & Short Term Investments (more comprehensive) first, like get_stock_info
+    cash_sti = latest['cash_sti']
+    cash = cash_sti.where(cash_sti.notna() & (cash_sti != 0), latest['cash'])
+    receivables = latest['accounts_receivable'].fillna(0) + latest['other_receivables'].fillna(0)
+    debt = latest['total_debt']
+    known = cash.notna() & debt.notna()
+    cash_debt_ok = ((cash + receivables) >= debt).astype('boolean').where(known, pd.NA)
+    return pd.DataFrame({'AL_ratio': al_ratio, 'cash_debt_ok': cash_debt_ok})
+
+
+_store: FundamentalsStore | None = None
+_store_lock = threading.Lock()
+
+
+def get_fundamentals_store() -> FundamentalsStore:
+    """Process-wide FundamentalsStore at STORE_DIR (compacted at exit)."""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = FundamentalsStore()
+            atexit.register(_store.compact)
+        return _store
@@ -1,5 +1,6 @@
 import subprocess
 import os
+import threading
 
 REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -31,3 +32,40 @@ def get_git_commit() -> str | None:
         return commit
     except Exception:
         return None
+
+
+class RunContext:
+    """
+    Per-process context shared by database writers.
+
+    `updated_by` (the get_git_commit() stamp) is resolved on first use and
+    reused for the rest of the run, so writers don't spawn git per row.
+    Call invalidate() if the working tree changes mid-run.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._resolved = False
+        self._updated_by: str | None = None
+
+    @property
+    def updated_by(self) -> str | None:
+        with self._lock:
+            if not self._resolved:
+                self._updated_by = get_git_commit()
+                self._resolved = True
+            return self._updated_by
+
+    def invalidate(self) -> None:
+        """Forget the cached commit stamp; the next access recomputes it."""
+        with self._lock:
+            self._resolved = False
+            self._updated_by = None
+
+
+_run_context = RunContext()
+
+
+def get_run_context() -> RunContext:
+    """The process-wide RunContext."""
+    return _run_context
@@ -0,0 +1,353 @@
+"""
+Persistent HTTP response cache (SQLite) shared by the yfinance session and
+the IRBANK fetcher, so reruns of the screener do not re-download pages and
+statements that were fetched minutes ago.
+
+Entries are keyed by URL + query parameters, expire per endpoint class
+(ENDPOINT_TTLS) and are evicted least-recently-used once the cache grows
+past max_bytes. Expired IRBANK pages are kept a while longer (STALE_RETENTION)
+so the fetcher can revalidate them with a conditional GET.
+"""
+
+import datetime as _dt
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from urllib.parse import parse_qsl, urlsplit, urlunsplit
+
+try:
+    from curl_cffi import requests as _http
+    _SESSION_KWARGS = {"impersonate": "chrome"}
+except ImportError:  # older yfinance releases run on plain requests
+    import requests as _http
+    _SESSION_KWARGS = {}
+
+from lib.ratelimit import HostRateLimiter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_PATH = os.path.join(REPO_ROOT, ".cache", "http_cache.sqlite")
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+
+YAHOO_HOST = "finance.yahoo.com"
+# Minimum spacing between outbound requests to Yahoo (any *.yahoo.com host),
+# shared by every session and thread in the process. One symbol takes about
+# four requests, so this matches the old 0.2s per-symbol delay.
+YAHOO_MIN_INTERVAL = 0.05
+
+# TTL per endpoint class (see endpoint_class)
+ENDPOINT_TTLS = {
+    "quote": _dt.timedelta(hours=1),          # ticker.info: prices, ratios
+    "chart": _dt.timedelta(days=1),           # dividend / price history
+    "statements": _dt.timedelta(days=30),     # annual + quarterly statements
+    "irbank": _dt.timedelta(days=7),          # IRBANK 決算まとめ page (revalidated, see STALE_RETENTION)
+}
+
+# How long expired entries are kept for conditional revalidation (ETag /
+# Last-Modified, see get_stale); other endpoint classes are dropped on expiry
+STALE_RETENTION = {
+    "irbank": _dt.timedelta(days=90),
+}
+
+# Puts between sweeps of expired entries; each sweep also recounts the stored
+# bytes (other processes may share the cache file)
+SWEEP_EVERY_PUTS = 256
+# Least recently used entries fetched per eviction step
+_EVICT_BATCH = 64
+
+# Query parameters that change between identical requests (auth, "now")
+_VOLATILE_PARAMS = {"crumb", "period2"}
+_STATEMENT_MODULES = ("incomeStatement", "balanceSheet", "cashflowStatement")
+
+
+def endpoint_class(url: str, params: dict | None = None) -> str | None:
+    """Map a request to its ENDPOINT_TTLS class, or None if it must not be cached."""
+    parts = urlsplit(url)
+    host = parts.netloc
+    path = parts.path
+    query = parts.query + "&" + "&".join(f"{k}={v}" for k, v in (params or {}).items())
+    if host.endswith("irbank.net"):
+        return "irbank"
+    if not host.endswith("finance.yahoo.com"):
+        return None
+    if "/v10/finance/quoteSummary/" in path:
+        if any(m in query for m in _STATEMENT_MODULES):
+            return "statements"
+        return "quote"
+    if path.startswith("/v7/finance/quote"):
+        return "quote"
+    if "/ws/fundamentals-timeseries/" in path:
+        # trailingPegRatio is part of ticker.info
+        return "quote" if "trailingPegRatio" in query else "statements"
+    if path.startswith("/v8/finance/chart/"):
+        return "chart"
+    return None
+
+
+def cacheable_body(endpoint: str, content: bytes) -> bool:
+    """
+    False for a 200 response that must not be cached: an empty body, or a
+    Yahoo soft error (HTML "Will be right back" page instead of JSON, or a
+    {"quoteSummary": {"result": [], "error": ...}}-style envelope with an
+    error or no result).
+    """
+    if not content or not content.strip():
+        return False
+    if endpoint == "irbank":
+        return True
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return False
+    if not isinstance(payload, dict):
+        return False
+    for envelope in payload.values():
+        if isinstance(envelope, dict) and ("result" in envelope or "error" in envelope):
+            if envelope.get("error") is not None or not envelope.get("result"):
+                return False
+    return True
+
+
+def cache_key(url: str, params: dict | None = None) -> str:
+    """Stable key for URL + params (query order and volatile params ignored)."""
+    parts = urlsplit(url)
+    items = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    items += [(str(k), str(v)) for k, v in (params or {}).items()]
+    items = sorted((k, v) for k, v in items if k not in _VOLATILE_PARAMS)
+    base = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    raw = base + "?" + "&".join(f"{k}={v}" for k, v in items)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    """Minimal requests/curl_cffi-style response served from the cache."""
+
+    from_cache = True
+
+    def __init__(self, url: str, status_code: int, content: bytes, headers: dict,
+                 stored_at: float | None = None):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        # When the body was fetched (or last revalidated), epoch seconds
+        self.stored_at = stored_at
+
+    @property
+    def ok(self) -> bool:
+        return self.status_code < 400
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def raise_for_status(self) -> None:
+        if not self.ok:
+            raise _http.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+class ResponseCache:
+    """
+    SQLite-backed response store with per-endpoint TTLs and LRU eviction.
+
+    Safe to share between threads. `stats` counts hits, misses, stores and
+    evictions per endpoint class. A put costs O(log n): the stored size is a
+    running total and expired entries are swept every SWEEP_EVERY_PUTS puts.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, max_bytes: int = MAX_CACHE_BYTES,
+                 ttls: dict[str, _dt.timedelta] | None = None,
+                 stale_retention: dict[str, _dt.timedelta] | None = None):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttls = dict(ENDPOINT_TTLS if ttls is None else ttls)
+        self.stale_retention = dict(STALE_RETENTION if stale_retention is None else stale_retention)
+        self.stats: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                endpoint TEXT NOT NULL,
+                url TEXT NOT NULL,
+                status INTEGER NOT NULL,
+                headers TEXT NOT NULL,
+                body BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                stored_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses(accessed_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_expires_at ON responses(expires_at)")
+        self._puts = 0
+        self._bytes = 0
+        with self._lock:
+            self._sweep()
+            self._evict()
+            self._conn.commit()
+
+    def _count(self, endpoint: str, counter: str, n: int = 1) -> None:
+        by_endpoint = self.stats.setdefault(endpoint, {"hits": 0, "misses": 0, "stores": 0, "evictions": 0})
+        by_endpoint[counter] += n
+
+    def get(self, key: str, endpoint: str) -> CachedResponse | None:
+        """Return the unexpired response for key, or None (counted as a miss)."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status, headers, body, stored_at FROM responses WHERE key = ? AND expires_at > ?",
+                (key, now),
+            ).fetchone()
+            if row is None:
+                self._count(endpoint, "misses")
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self._count(endpoint, "hits")
+        url, status, headers, body, stored_at = row
+        return CachedResponse(url, status, bytes(body), json.loads(headers), stored_at)
+
+    def get_stale(self, key: str) -> CachedResponse | None:
+        """Return the stored response for key even if expired (for revalidation), without counting a lookup."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT url, status, headers, body, stored_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None:
+            return None
+        url, status, headers, body, stored_at = row
+        return CachedResponse(url, status, bytes(body), json.loads(headers), stored_at)
+
+    def put(self, key: str, endpoint: str, url: str, status: int, body: bytes,
+            headers: dict | None = None) -> float:
+        """Store a response under key with the TTL of its endpoint class; returns its stored_at."""
+        now = time.time()
+        expires_at = now + self.ttls[endpoint].total_seconds()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._conn.execute(
+                """
+                INSERT OR REPLACE INTO responses
+                    (key, endpoint, url, status, headers, body, size, stored_at, expires_at, accessed_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (key, endpoint, url, status, json.dumps(dict(headers or {})), body, len(body), now, expires_at, now),
+            )
+            self._bytes += len(body) - (old[0] if old else 0)
+            self._count(endpoint, "stores")
+            self._puts += 1
+            if self._puts % SWEEP_EVERY_PUTS == 0:
+                self._sweep()
+            self._evict()
+            self._conn.commit()
+        return now
+
+    def _sweep(self) -> None:
+        """Drop expired entries past their stale retention and recount the stored bytes (lock held)."""
+        now = time.time()
+        retained = list(self.stale_retention)
+        self._conn.execute(
+            f"DELETE FROM responses WHERE expires_at <= ? AND endpoint NOT IN ({','.join('?' * len(retained))})",
+            (now, *retained),
+        )
+        for endpoint, retention in self.stale_retention.items():
+            self._conn.execute(
+                "DELETE FROM responses WHERE endpoint = ? AND expires_at <= ?",
+                (endpoint, now - retention.total_seconds()),
+            )
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+
+    def _evict(self) -> None:
+        """Drop least recently used entries until under max_bytes (lock held)."""
+        while self._bytes > self.max_bytes:
+            victims = self._conn.execute(
+                "SELECT key, endpoint, size FROM responses ORDER BY accessed_at LIMIT ?", (_EVICT_BATCH,)
+            ).fetchall()
+            if not victims:
+                self._bytes = 0
+                return
+            for key, endpoint, size in victims:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._count(endpoint, "evictions")
+                self._bytes -= size
+                if self._bytes <= self.max_bytes:
+                    return
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+            self._bytes = 0
+
+    def hit_rate(self) -> float | None:
+        hits = sum(s["hits"] for s in self.stats.values())
+        lookups = hits + sum(s["misses"] for s in self.stats.values())
+        return round(hits / lookups, 3) if lookups else None
+
+
+_yahoo_rate_limiter = HostRateLimiter(YAHOO_MIN_INTERVAL)
+
+
+class CachingSession(_http.Session):
+    """
+    HTTP session for yfinance that answers GETs to cacheable Yahoo endpoints
+    from a ResponseCache; everything else (cookie, crumb, consent) goes
+    straight to the network. Every request that reaches Yahoo is spaced by
+    the process-wide YAHOO_MIN_INTERVAL limiter.
+    """
+
+    def __init__(self, response_cache: ResponseCache, **kwargs):
+        super().__init__(**kwargs)
+        # Not named `cache`: yfinance rejects sessions with an active `cache` attribute
+        self.response_cache = response_cache
+
+    def get(self, url, params=None, **kwargs):
+        endpoint = endpoint_class(url, params)
+        if endpoint is None:
+            return super().get(url, params=params, **kwargs)
+        key = cache_key(url, params)
+        cached = self.response_cache.get(key, endpoint)
+        if cached is not None:
+            return cached
+        resp = super().get(url, params=params, **kwargs)
+        if resp.status_code == 200 and cacheable_body(endpoint, resp.content):
+            self.response_cache.put(key, endpoint, str(resp.url), resp.status_code, resp.content,
+                                    {"Content-Type": resp.headers.get("Content-Type", "")})
+        return resp
+
+    def request(self, method, url, *args, **kwargs):
+        if urlsplit(url).netloc.endswith("yahoo.com"):
+            _yahoo_rate_limiter.wait(YAHOO_HOST)
+        return super().request(method, url, *args, **kwargs)
+
+
+_response_cache: ResponseCache | None = None
+_yfinance_session: CachingSession | None = None
+_init_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """Process-wide ResponseCache at CACHE_PATH (opened on first use)."""
+    global _response_cache
+    with _init_lock:
+        if _response_cache is None:
+            _response_cache = ResponseCache()
+        return _response_cache
+
+
+def get_yfinance_session() -> CachingSession:
+    """Process-wide caching session to pass to yf.Ticker(session=...)."""
+    global _yfinance_session
+    cache = get_response_cache()
+    with _init_lock:
+        if _yfinance_session is None:
+            _yfinance_session = CachingSession(cache, **_SESSION_KWARGS)
+        return _yfinance_session
@@ -0,0 +1,116 @@
+"""
+Typed ingest of MarketInOut CSV exports with a cached binary snapshot.
+
+read_export() parses an export once with explicit dtypes and keeps the
+result as an Arrow IPC (Feather) snapshot under .cache/ingest, keyed by the
+file's size, mtime and content hash. Later loads memory-map the snapshot
+instead of re-parsing and re-inferring the CSV; a re-copied export with the
+same contents keeps its snapshot. Needs pyarrow for snapshots; without it
+every load parses the CSV (with the same dtypes).
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    ARROW_AVAILABLE = True
+except ImportError:
+    ARROW_AVAILABLE = False
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SNAPSHOT_DIR = os.path.join(REPO_ROOT, ".cache", "ingest")
+CSV_ENCODING = 'latin-1'
+_KEY_METADATA = b"ingest_key"
+
+
+def file_sha256(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _snapshot_path(path: str) -> str:
+    tag = hashlib.sha1(os.path.abspath(path).encode('utf-8')).hexdigest()[:12]
+    return os.path.join(SNAPSHOT_DIR, f"{os.path.basename(path)}.{tag}.arrow")
+
+
+def _read_snapshot(snapshot: str) -> tuple[dict | None, pa.Table | None]:
+    """(stored key, memory-mapped table) of a snapshot, or (None, None) if missing/unreadable."""
+    try:
+        source = pa.memory_map(snapshot, 'r')
+        table = pa.ipc.open_file(source).read_all()
+    except (OSError, pa.ArrowInvalid):
+        return None, None
+    raw = (table.schema.metadata or {}).get(_KEY_METADATA)
+    return (json.loads(raw) if raw else None), table
+
+
+def _to_frame(table: pa.Table) -> pd.DataFrame:
+    """Snapshot table as a DataFrame; dictionary columns become categoricals built from their codes."""
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if pa.types.is_dictionary(column.type):
+            column = column.combine_chunks()
+            codes = column.indices.fill_null(-1).to_numpy()
+            categories = pd.CategoricalDtype(pd.Index(column.dictionary.to_pandas()))
+            columns[name] = pd.Categorical.from_codes(codes, dtype=categories)
+        else:
+            columns[name] = column.to_pandas()
+    return pd.DataFrame(columns)
+
+
+def _write_snapshot(snapshot: str, df: pd.DataFrame, key: dict) -> None:
+    try:
+        table = pa.Table.from_pandas(df, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        return  # mixed-type column: keep parsing the CSV for this file
+    table = table.replace_schema_metadata({**(table.schema.metadata or {}), _KEY_METADATA: json.dumps(key)})
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    tmp = snapshot + ".tmp"
+    with pa.OSFile(tmp, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    os.replace(tmp, snapshot)
+
+
+def parse_export(path: str, dtypes: dict[str, str] | None = None) -> pd.DataFrame:
+    """Parse a MarketInOut CSV; columns in dtypes get that dtype, the rest are inferred."""
+    df = pd.read_csv(path, encoding=CSV_ENCODING)
+    wanted = {col: dtype for col, dtype in (dtypes or {}).items() if col in df.columns}
+    return df.astype(wanted) if wanted else df
+
+
+def read_export(path: str, dtypes: dict[str, str] | None = None) -> pd.DataFrame:
+    """
+    The export at path as a typed DataFrame, from the snapshot when it is current.
+
+    The snapshot is reused when size and mtime are unchanged, or when the
+    contents hash the same (the download step re-copies unchanged exports);
+    otherwise the CSV is parsed and the snapshot rewritten.
+    """
+    if not ARROW_AVAILABLE:
+        return parse_export(path, dtypes)
+    st = os.stat(path)
+    key = {'size': st.st_size, 'mtime_ns': st.st_mtime_ns, 'dtypes': dtypes or {}}
+    snapshot = _snapshot_path(path)
+    stored, table = _read_snapshot(snapshot)
+    if stored is not None and stored.get('dtypes') == key['dtypes']:
+        if stored['size'] == key['size'] and stored['mtime_ns'] == key['mtime_ns']:
+            return _to_frame(table)
+        key['sha256'] = file_sha256(path)
+        if stored.get('sha256') == key['sha256']:
+            df = _to_frame(table)
+            _write_snapshot(snapshot, df, key)
+            return df
+    key.setdefault('sha256', file_sha256(path))
+    df = parse_export(path, dtypes)
+    _write_snapshot(snapshot, df, key)
+    return df
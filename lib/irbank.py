@@ -10,11 +10,104 @@ from __future__ import annotations
 
 import datetime as _dt
 import re
-import urllib.error
-import urllib.request
+import threading
+import time
+from html.parser import HTMLParser
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPSConnectionPool
+
+from lib import metrics
+from lib.fundamentals import get_fundamentals_store
+from lib.http_cache import cache_key, cacheable_body, get_response_cache
+from lib.ratelimit import HostRateLimiter
+
+IRBANK_HOST = "irbank.net"
 IRBANK_RESULTS_URL = "https://irbank.net/{code}/results"
 USER_AGENT = "Mozilla/5.0 (compatible; Stocks-screener/1.0; +local)"
+# Minimum spacing between requests to irbank.net, shared by all fetching threads
+IRBANK_MIN_INTERVAL = 1.0
+# Requests to irbank.net in flight at once (also the keep-alive pool size)
+IRBANK_MAX_CONCURRENCY = 2
+# Retries after a connection error, timeout, 429 or 5xx; backoff doubles per retry
+IRBANK_MAX_RETRIES = 3
+IRBANK_RETRY_BACKOFF = 2.0
+_RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class _CountingHTTPSConnectionPool(HTTPSConnectionPool):
+    """Counts new TCP+TLS connections, so the run metrics show how often keep-alive was reused."""
+
+    def _new_conn(self):
+        metrics.incr(metrics.IRBANK_CONNECTIONS)
+        return super()._new_conn()
+
+
+class _CountingAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            **self.poolmanager.pool_classes_by_scheme,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+class IrbankClient:
+    """
+    Keep-alive HTTP client for irbank.net, shared by all fetching threads.
+
+    One pooled session (gzip, connection reuse), at most max_concurrency
+    requests in flight, spaced by min_interval, and bounded retries with
+    exponential backoff. Requests, new connections and retries are counted
+    in lib.metrics.
+    """
+
+    def __init__(self, max_concurrency: int = IRBANK_MAX_CONCURRENCY, max_retries: int = IRBANK_MAX_RETRIES,
+                 backoff: float = IRBANK_RETRY_BACKOFF, min_interval: float = IRBANK_MIN_INTERVAL):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": USER_AGENT, "Accept-Encoding": "gzip, deflate"})
+        self.session.mount("https://", _CountingAdapter(pool_connections=1, pool_maxsize=max_concurrency))
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+        self._rate_limiter = HostRateLimiter(min_interval)
+
+    def get(self, url: str, headers: dict | None = None, timeout: float = 15.0) -> requests.Response | None:
+        """GET url; None when every attempt failed or kept returning a retryable status."""
+        delay = self.backoff
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                metrics.incr(metrics.RETRIES)
+                time.sleep(delay)
+                delay *= 2
+            try:
+                with self._slots:
+                    self._rate_limiter.wait(IRBANK_HOST)
+                    with metrics.timed(metrics.SOURCE_IRBANK_HTTP):
+                        resp = self.session.get(url, headers=headers, timeout=timeout)
+            except requests.RequestException:
+                continue
+            metrics.incr(metrics.IRBANK_REQUESTS)
+            if resp.status_code not in _RETRY_STATUSES:
+                return resp
+            retry_after = resp.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+        return None
+
+
+_client: IrbankClient | None = None
+_client_lock = threading.Lock()
+
+
+def get_irbank_client() -> IrbankClient:
+    """Process-wide IrbankClient (created on first use)."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = IrbankClient()
+        return _client
 
 
 def tokyo_numeric_code(symbol: str) -> str | None:
@@ -25,87 +118,199 @@ def tokyo_numeric_code(symbol: str) -> str | None:
     return code if code.isdigit() else None
 
 
-def fetch_results_html(code: str, timeout: float = 15.0) -> str | None:
-    """GET 決算まとめ HTML, or None on failure."""
+def fetch_results_html(code: str, timeout: float = 15.0) -> tuple[str, float] | None:
+    """
+    GET 決算まとめ HTML (served from the response cache when fresh), or None on failure.
+
+    Returns (html, stored_at): stored_at is when the page was fetched or last
+    revalidated (epoch seconds), so data derived from it can expire with it.
+    An expired cached copy is revalidated with If-None-Match / If-Modified-Since;
+    on 304 it is stored again with a fresh TTL instead of re-downloading the page.
+    """
     url = IRBANK_RESULTS_URL.format(code=code)
-    req = urllib.request.Request(url, headers={"User-Agent": USER_AGENT})
-    try:
-        with urllib.request.urlopen(req, timeout=timeout) as resp:
-            if resp.status != 200:
-                return None
-            return resp.read().decode("utf-8", errors="replace")
-    except (urllib.error.HTTPError, urllib.error.URLError, TimeoutError, OSError):
+    cache = get_response_cache()
+    key = cache_key(url)
+    cached = cache.get(key, "irbank")
+    if cached is not None:
+        return cached.text, cached.stored_at
+    stale = cache.get_stale(key)
+    conditional = {}
+    if stale is not None:
+        if stale.headers.get("ETag"):
+            conditional["If-None-Match"] = stale.headers["ETag"]
+        if stale.headers.get("Last-Modified"):
+            conditional["If-Modified-Since"] = stale.headers["Last-Modified"]
+    resp = get_irbank_client().get(url, headers=conditional, timeout=timeout)
+    if resp is None:
+        return None
+    if resp.status_code == 304 and stale is not None:
+        metrics.incr(metrics.IRBANK_NOT_MODIFIED)
+        stored_at = cache.put(key, "irbank", url, 200, stale.content, stale.headers)
+        return stale.text, stored_at
+    if resp.status_code != 200:
         return None
+    body = resp.content
+    if not cacheable_body("irbank", body):
+        return None
+    headers = {"Content-Type": resp.headers.get("Content-Type", "text/html")}
+    for name in ("ETag", "Last-Modified"):
+        if resp.headers.get(name):
+            headers[name] = resp.headers[name]
+    stored_at = cache.put(key, "irbank", url, 200, body, headers)
+    return body.decode("utf-8", errors="replace"), stored_at
+
 
+# 決算まとめ sections, located once per page by parse_results_page. IRBANK emits
+# lower-case ids; the case-insensitive scan only runs for a section not found.
+_SECTION_ID_RE = re.compile(r'id="(c_dividend|c_pl)"')
+_SECTION_ID_ANYCASE_RE = re.compile(r'id="(c_dividend|c_pl)"', re.IGNORECASE)
+_FISCAL_LABEL_RE = re.compile(r"(\d{4})/\d{2}")
 
-def _strip_tags(fragment: str) -> str:
-    return re.sub(r"<[^>]+>", "", fragment).strip()
 
+class _TableDone(Exception):
+    """Raised by _SectionTableParser at the closing tag of the section table."""
 
-def _parse_dividend_tbody_after_c_dividend(html: str) -> list[tuple[int, float | None]]:
+
+class _SectionTableParser(HTMLParser):
     """
-    Parse fiscal years and per-share dividend (yen) from IRBANK 配当 table.
-    Returns list of (fiscal_start_year, dps_or_none) e.g. (2010, 5.0), (2009, None).
+    Cells of the first <table> after a section heading, fed from the heading's
+    start tag on. Collects the first <thead> row and every <tbody> row as
+    (tag, text, title) cells: text has entities decoded and comments dropped,
+    title is the first title attribute in the cell. Rows of nested tables stay
+    inside their enclosing cell. Raises _TableDone when the table closes.
     """
-    m = re.search(r'id="c_dividend"[^>]*>.*?</h2>\s*<div>\s*<table[^>]*>.*?<tbody>(.*?)</tbody>', html, re.DOTALL | re.IGNORECASE)
-    if not m:
-        return []
-    tbody = m.group(1)
-    rows: list[tuple[int, float | None]] = []
-    for tr in re.finditer(r"<tr[^>]*>(.*?)</tr>", tbody, re.DOTALL | re.IGNORECASE):
-        row = tr.group(1)
-        tds = re.findall(r"<td[^>]*>(.*?)</td>", row, re.DOTALL | re.IGNORECASE)
-        if len(tds) < 2:
-            continue
-        fy_cell = _strip_tags(tds[0])
-        if "予" in fy_cell:
-            continue
-        fy_m = re.search(r"(\d{4}/\d{2})", fy_cell)
-        if not fy_m:
-            continue
-        year = int(fy_m.group(1).split("/")[0])
-        dps_cell = tds[1]
-        dps_plain = _strip_tags(dps_cell)
-        if dps_plain in ("-", "−", "", "—"):
-            rows.append((year, None))
-            continue
-        try:
-            dps = float(dps_plain.replace(",", ""))
-        except ValueError:
-            rows.append((year, None))
-            continue
-        rows.append((year, dps))
-    return rows
-
-
-def _pl_thead_first_row(html_fragment: str) -> str | None:
-    m = re.search(r"<thead[^>]*>\s*<tr[^>]*>(.*?)</tr>", html_fragment, re.DOTALL | re.IGNORECASE)
-    return m.group(1) if m else None
-
-
-def _pl_net_income_column_index(html: str) -> int | None:
-    m = re.search(
-        r'id="c_pl"[^>]*>.*?</h2>\s*<div>\s*<table[^>]*>(.*?)</table>',
-        html,
-        re.DOTALL | re.IGNORECASE,
-    )
-    if not m:
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.header: list[tuple[str, str, str]] | None = None
+        self.body: list[list[tuple[str, str, str]]] = []
+        self._depth = 0  # <table> nesting; 1 = the section table
+        self._part: str | None = None  # "thead" / "tbody" of the section table
+        self._row: list[tuple[str, str, str]] | None = None
+        self._cell: list[str] | None = None
+        self._cell_tag = ""
+        self._title: str | None = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == "table":
+            self._depth += 1
+            return
+        if self._depth == 0:
+            return
+        if self._cell is not None and self._title is None:
+            self._title = dict(attrs).get("title")
+        if self._depth > 1:
+            return
+        if tag in ("thead", "tbody"):
+            self._end_row()
+            self._part = tag
+        elif tag == "tr" and self._part is not None:
+            self._end_row()
+            self._row = []
+        elif tag in ("td", "th") and self._row is not None:
+            self._end_cell()
+            self._cell, self._cell_tag, self._title = [], tag, dict(attrs).get("title")
+
+    def handle_endtag(self, tag):
+        if self._depth == 0:
+            return
+        if tag == "table":
+            self._depth -= 1
+            if self._depth == 0:
+                self._end_row()
+                raise _TableDone
+            return
+        if self._depth > 1:
+            return
+        if tag in ("td", "th"):
+            self._end_cell()
+        elif tag == "tr":
+            self._end_row()
+        elif tag in ("thead", "tbody"):
+            self._end_row()
+            self._part = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+    def _end_cell(self) -> None:
+        if self._cell is not None:
+            self._row.append((self._cell_tag, "".join(self._cell).strip(), (self._title or "").strip()))
+            self._cell = None
+
+    def _end_row(self) -> None:
+        self._end_cell()
+        if self._row is None:
+            return
+        if self._part == "thead" and self.header is None:
+            self.header = self._row
+        elif self._part == "tbody":
+            self.body.append(self._row)
+        self._row = None
+
+
+def _locate_sections(html: str) -> dict[str, int]:
+    """Offset of the start tag carrying each section id ("c_dividend", "c_pl") found."""
+    found: dict[str, int] = {}
+    for pattern in (_SECTION_ID_RE, _SECTION_ID_ANYCASE_RE):
+        for m in pattern.finditer(html):
+            name = m.group(1).lower()
+            if name not in found:
+                found[name] = html.rfind("<", 0, m.start())
+                if len(found) == 2:
+                    return found
+    return found
+
+
+def _section_table(html: str, start: int) -> _SectionTableParser:
+    """Parse the section table following the heading at start (stops at its closing tag)."""
+    parser = _SectionTableParser()
+    try:
+        parser.feed(html[start:])
+        parser.close()
+    except _TableDone:
+        pass
+    return parser
+
+
+def _fiscal_start_year(text: str) -> int | None:
+    """YYYY of a YYYY/MM fiscal label cell; None for forecasts (予) or unparseable cells."""
+    if "予" in text:
+        return None
+    fy_m = _FISCAL_LABEL_RE.search(text)
+    return int(fy_m.group(1)) if fy_m else None
+
+
+def _dividend_row(tds: list[str]) -> tuple[int, float | None] | None:
+    """(fiscal_start_year, dps_or_none) from the <td> texts of one 配当 row."""
+    if len(tds) < 2:
         return None
-    thead_row = _pl_thead_first_row(m.group(1))
-    if not thead_row:
+    year = _fiscal_start_year(tds[0])
+    if year is None:
         return None
-    ths = re.findall(r"<th[^>]*>(.*?)</th>", thead_row, re.DOTALL | re.IGNORECASE)
-    for i, th_html in enumerate(ths):
-        if _th_is_net_income_pl_column(th_html):
-            return i
-    return None
+    if tds[1] in ("-", "−", "", "—"):
+        return year, None
+    try:
+        return year, float(tds[1].replace(",", ""))
+    except ValueError:
+        return year, None
 
 
-def _th_is_net_income_pl_column(th_html: str) -> bool:
+def _pl_loss_row(tds: list[str], col_idx: int) -> tuple[int, bool | None] | None:
+    """(fiscal_start_year, is_loss) from the <td> texts of one 会社業績 row."""
+    if not tds:
+        return None
+    year = _fiscal_start_year(tds[0])
+    if year is None:
+        return None
+    if col_idx >= len(tds):
+        return year, None
+    return year, _pl_cell_is_loss(tds[col_idx])
+
+
+def _th_is_net_income_pl_column(text: str, title: str) -> bool:
     """True if this <th> is net income for the 会社業績 table (IRBANK label varies by issuer)."""
-    title_m = re.search(r'title="([^"]*)"', th_html, re.IGNORECASE)
-    title = (title_m.group(1) if title_m else "").strip()
-    text = _strip_tags(th_html).strip()
     if "当期利益" in text or "当期利益" in title:
         return True
     if "当期純利益" in text or "当期純利益" in title:
@@ -139,48 +344,53 @@ def _pl_cell_is_loss(plain: str) -> bool:
         return False
 
 
-def _parse_year_loss_from_pl(html: str) -> int | None:
+def parse_results_page(html: str) -> tuple[list[tuple[int, float | None]], list[tuple[int, bool | None]] | None]:
     """
-    Latest fiscal start-year with a loss in 会社業績 net income column (当期利益 / 純利 / 当期純利益).
+    Dividend rows and 会社業績 loss rows of a 決算まとめ page.
+
+    The page is scanned once for the c_dividend / c_pl section ids, and only
+    the table after each heading is run through html.parser.
+
+    Returns:
+        (dividend_rows, loss_rows): dividend_rows are (fiscal_start_year,
+        dps_or_none) e.g. (2010, 5.0), (2009, None); loss_rows are
+        (fiscal_start_year, is_loss) from the net income column (当期利益 /
+        純利 / 当期純利益), is_loss None when the row has no such cell, and
+        loss_rows is None when the section or column is missing.
+    """
+    sections = _locate_sections(html)
+    dividend_rows: list[tuple[int, float | None]] = []
+    if "c_dividend" in sections:
+        for cells in _section_table(html, sections["c_dividend"]).body:
+            row = _dividend_row([text for tag, text, _ in cells if tag == "td"])
+            if row is not None:
+                dividend_rows.append(row)
+
+    loss_rows: list[tuple[int, bool | None]] | None = None
+    table = _section_table(html, sections["c_pl"]) if "c_pl" in sections else None
+    ths = [(text, title) for tag, text, title in (table.header or []) if tag == "th"] if table else []
+    col_idx = next((i for i, (text, title) in enumerate(ths) if _th_is_net_income_pl_column(text, title)), None)
+    if col_idx is not None and table.body:
+        loss_rows = []
+        for cells in table.body:
+            row = _pl_loss_row([text for tag, text, _ in cells if tag == "td"], col_idx)
+            if row is not None:
+                loss_rows.append(row)
+    return dividend_rows, loss_rows
+
+
+def year_loss_from_pl_rows(rows: list[tuple[int, bool | None]] | None) -> int | None:
+    """
+    Latest fiscal start-year with a loss in 会社業績 rows (parse_results_page).
 
     Returns:
         int: max loss year (fiscal label YYYY/MM -> YYYY)
         0: table and column found, no loss rows
         None: section/column missing or no parseable body rows
     """
-    col_idx = _pl_net_income_column_index(html)
-    if col_idx is None:
-        return None
-    m = re.search(
-        r'id="c_pl"[^>]*>.*?</h2>\s*<div>\s*<table[^>]*>.*?<tbody>(.*?)</tbody>',
-        html,
-        re.DOTALL | re.IGNORECASE,
-    )
-    if not m:
-        return None
-    tbody = m.group(1)
-    loss_years: list[int] = []
-    saw_fy_row = False
-    for tr in re.finditer(r"<tr[^>]*>(.*?)</tr>", tbody, re.DOTALL | re.IGNORECASE):
-        row = tr.group(1)
-        tds = re.findall(r"<td[^>]*>(.*?)</td>", row, re.DOTALL | re.IGNORECASE)
-        if not tds:
-            continue
-        fy_cell = _strip_tags(tds[0])
-        if "予" in fy_cell:
-            continue
-        fy_m = re.search(r"(\d{4}/\d{2})", fy_cell)
-        if not fy_m:
-            continue
-        saw_fy_row = True
-        year = int(fy_m.group(1).split("/")[0])
-        if col_idx >= len(tds):
-            continue
-        ni_plain = _strip_tags(tds[col_idx])
-        if _pl_cell_is_loss(ni_plain):
-            loss_years.append(year)
-    if not saw_fy_row:
+    if not rows:
         return None
+    loss_years = [year for year, is_loss in rows if is_loss]
     if not loss_years:
         return 0
     return max(loss_years)
@@ -220,21 +430,25 @@ def try_irbank_fiscal_fields(symbol: str) -> dict | None:
 
     Returns:
         None if symbol is not .T or HTTP fetch failed.
-        Otherwise {"first_div_year", "last_no_div_year", "year_loss"} — dividend
-        keys may be None when no DPS row; year_loss is int (>=0) or None if PL
-        column/table could not be parsed.
+        Otherwise {"first_div_year", "last_no_div_year", "year_loss", "fetched_at"} —
+        dividend keys may be None when no DPS row; year_loss is int (>=0) or None
+        if PL column/table could not be parsed; fetched_at is when the page was
+        fetched or revalidated (UTC datetime).
     """
     code = tokyo_numeric_code(symbol)
     if not code:
         return None
-    html = fetch_results_html(code)
-    if not html:
+    page = fetch_results_html(code)
+    if page is None:
         return None
-    yloss = _parse_year_loss_from_pl(html)
-    rows = _parse_dividend_tbody_after_c_dividend(html)
+    html, stored_at = page
+    rows, loss_rows = parse_results_page(html)
+    yloss = year_loss_from_pl_rows(loss_rows)
     first_y, gap_y = dividend_first_and_gap_years(rows)
+    get_fundamentals_store().record_irbank(symbol, rows, loss_rows)
     return {
         "first_div_year": first_y,
         "last_no_div_year": gap_y,
         "year_loss": yloss,
+        "fetched_at": _dt.datetime.fromtimestamp(stored_at, _dt.timezone.utc),
     }
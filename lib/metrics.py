@@ -0,0 +1,177 @@
+"""
+Per-run screener metrics: stage wall times, upstream latency by source,
+response-cache hit rates and error counters, emitted as one JSON line.
+
+Instrumented code calls record()/incr() unconditionally; they are no-ops
+unless a RunMetrics is active (see RunMetrics.activate), so library users
+outside the screener pay nothing.
+"""
+
+import datetime as _dt
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from lib.http_cache import get_response_cache
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+METRICS_PATH = os.path.join(REPO_ROOT, ".cache", "screener_metrics.jsonl")
+
+# Latency sources recorded by the fetch layers
+SOURCE_YF_INFO = "yfinance_info"
+SOURCE_YF_BALANCE_SHEET = "yfinance_balance_sheet"
+SOURCE_YF_INCOME_STMT = "yfinance_income_stmt"
+SOURCE_YF_DIVIDENDS = "yfinance_dividends"
+SOURCE_YF_QUOTE_SUMMARY = "yfinance_quote_summary"
+SOURCE_IRBANK_HTTP = "irbank_http"
+SOURCE_POSTGRES = "postgres"
+SOURCE_SYMBOL_TOTAL = "symbol_total"
+
+# Counters
+RETRIES = "retries"
+SYMBOL_NOT_FOUND = "symbol_not_found"
+IRBANK_REQUESTS = "irbank_requests"
+IRBANK_CONNECTIONS = "irbank_connections"
+IRBANK_NOT_MODIFIED = "irbank_not_modified"
+
+
+def _percentile(sorted_values: list[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted, non-empty list."""
+    idx = min(len(sorted_values) - 1, max(0, round(q * (len(sorted_values) - 1))))
+    return sorted_values[idx]
+
+
+class RunMetrics:
+    """
+    Thread-safe collector for one screener run.
+
+    `stage_seconds` holds wall time per stage (summed over repeated stages);
+    latency samples are kept per source and summarized by summary().
+    """
+
+    def __init__(self):
+        self.started_at = _dt.datetime.now(_dt.timezone.utc)
+        self.stage_seconds: dict[str, float] = {}
+        self.counters: dict[str, int] = {
+            RETRIES: 0, SYMBOL_NOT_FOUND: 0, IRBANK_REQUESTS: 0, IRBANK_CONNECTIONS: 0, IRBANK_NOT_MODIFIED: 0,
+        }
+        self.extra: dict[str, object] = {}
+        self._samples: dict[str, list[float]] = {}
+        self._cache_stats_start: dict[str, dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    # --- collection -----------------------------------------------------------
+
+    def record(self, source: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(source, []).append(seconds)
+
+    def incr(self, counter: str, n: int = 1) -> None:
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + n
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time a block as (part of) stage `name`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.stage_seconds[name] = self.stage_seconds.get(name, 0.0) + elapsed
+
+    @contextmanager
+    def activate(self):
+        """Make this the collector used by record()/incr()/timed() for the duration of the block."""
+        global _active
+        self._cache_stats_start = {k: dict(v) for k, v in get_response_cache().stats.items()}
+        previous = _active
+        _active = self
+        try:
+            yield self
+        finally:
+            _active = previous
+
+    # --- reporting ------------------------------------------------------------
+
+    def _cache_summary(self) -> dict[str, dict]:
+        """Response-cache hits/misses per endpoint class during this run."""
+        summary = {}
+        for endpoint, stats in get_response_cache().stats.items():
+            start = self._cache_stats_start.get(endpoint, {})
+            delta = {k: v - start.get(k, 0) for k, v in stats.items()}
+            lookups = delta["hits"] + delta["misses"]
+            if lookups == 0 and delta["stores"] == 0:
+                continue
+            delta["hit_rate"] = round(delta["hits"] / lookups, 3) if lookups else None
+            summary[endpoint] = delta
+        return summary
+
+    def summary(self) -> dict:
+        """JSON-serializable snapshot of everything collected so far."""
+        with self._lock:
+            samples = {source: sorted(values) for source, values in self._samples.items()}
+            counters = dict(self.counters)
+            stages = {name: round(seconds, 3) for name, seconds in self.stage_seconds.items()}
+        latency = {}
+        for source, values in sorted(samples.items()):
+            latency[source] = {
+                "count": len(values),
+                "total_s": round(sum(values), 3),
+                "mean_s": round(sum(values) / len(values), 4),
+                "p50_s": round(_percentile(values, 0.5), 4),
+                "p95_s": round(_percentile(values, 0.95), 4),
+                "max_s": round(values[-1], 4),
+            }
+        return {
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "stage_seconds": stages,
+            "latency": latency,
+            "cache": self._cache_summary(),
+            "counters": counters,
+            **self.extra,
+        }
+
+    def to_json(self) -> str:
+        return json.dumps(self.summary(), sort_keys=False, default=str)
+
+    def write(self, path: str = METRICS_PATH) -> str:
+        """Append the summary as one JSON line to path and return the line."""
+        line = self.to_json()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        return line
+
+
+_active: RunMetrics | None = None
+
+
+def current() -> RunMetrics | None:
+    """The active RunMetrics, or None outside an instrumented run."""
+    return _active
+
+
+def record(source: str, seconds: float) -> None:
+    metrics = _active
+    if metrics is not None:
+        metrics.record(source, seconds)
+
+
+def incr(counter: str, n: int = 1) -> None:
+    metrics = _active
+    if metrics is not None:
+        metrics.incr(counter, n)
+
+
+@contextmanager
+def timed(source: str):
+    """Record the wall time of a block as one latency sample for source."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(source, time.perf_counter() - start)
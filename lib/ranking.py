@@ -0,0 +1,190 @@
+"""
+Partial-selection ranking: the best rows of a frame without sorting all of it.
+
+TopKRanking orders rows lexicographically by one or more keys (NaN last,
+ties by row position, i.e. what DataFrame.sort_values(kind='stable') gives)
+and produces the ranking lazily in chunks. Each chunk is picked from the
+rows not yet ranked with numpy.argpartition and only the chunk is sorted,
+so taking the head of a large universe costs about O(N) per chunk instead
+of an O(N log N) sort.
+
+The keys are packed into one order-preserving uint64 per row. Each key
+takes the bit width of its dtype (bool and int8 8, float32 32, int64 and
+float64 64), plus 1 bit for a nullable integer key with missing values.
+When the sum exceeds 64 (e.g. the screener's int8 flag and float64 ratio,
+8 + 64 = 72 bits) and the leading keys take only a few distinct values,
+each group of equal leading keys is ranked in turn by the last key; other
+wide key sets are ranked with a full lexsort instead.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+
+from lib.data import PB, PE, PRICE
+
+# Rows in the first chunk; each following chunk is twice as large
+RANK_CHUNK = 64
+# Most distinct leading-key values ranked group by group before falling back to a full sort
+MAX_RANK_GROUPS = 16
+
+
+def _key_codes(values: np.ndarray, ascending: bool) -> tuple[np.ndarray, int]:
+    """(uint64 codes ordered like the values with NaN last, code width in bits) for one key."""
+    if values.dtype == bool:
+        values = values.astype(np.uint8)
+    if values.dtype.kind in 'iu':
+        width = values.dtype.itemsize * 8
+        if values.dtype.kind == 'i':
+            codes = (values.astype(np.int64) - np.iinfo(values.dtype).min).astype(np.uint64)
+        else:
+            codes = values.astype(np.uint64)
+        top = np.uint64((1 << width) - 1)
+        return (codes if ascending else top - codes), width
+    if values.dtype.kind != 'f':
+        raise TypeError(f"cannot rank by {values.dtype} values")
+    if values.dtype == np.float16:
+        values = values.astype(np.float32)
+    width = values.dtype.itemsize * 8
+    uint = np.dtype(f"uint{width}")
+    sign = uint.type(1 << (width - 1))
+    nan = np.isnan(values)
+    bits = (values + 0.0).view(uint)  # + 0.0 folds -0.0 into 0.0
+    # Positive floats order like their bits once the sign bit is set; negative ones reversed
+    codes = np.where(bits & sign, ~bits, bits | sign).astype(np.uint64)
+    top = np.uint64((1 << width) - 1)  # reserved for NaN: above +inf
+    if not ascending:
+        codes = (top - np.uint64(1)) - codes
+    codes[nan] = top
+    return codes, width
+
+
+def _pack(coded: list[tuple[np.ndarray, int]], n: int) -> np.ndarray:
+    """Key codes packed most significant first into one uint64 per row (widths must fit in 64 bits)."""
+    packed = np.zeros(n, dtype=np.uint64)
+    for codes, width in coded:
+        packed = (packed << np.uint64(width)) | codes
+    return packed
+
+
+def _key_values(key) -> tuple[np.ndarray, np.ndarray | None]:
+    """
+    Key values as a numpy array plus, for a nullable integer key with missing
+    values, the missing mask (None otherwise). Integer and bool keys keep
+    their dtype (exact above 2**53); other nullable keys become float64 with
+    NaN for missing.
+    """
+    if isinstance(key, (pd.Series, pd.Index)):
+        key = key.array
+    if isinstance(key, pd.arrays.NumpyExtensionArray):
+        return key.to_numpy(), None
+    if isinstance(key, pd.api.extensions.ExtensionArray):
+        if key.dtype.kind in 'iu':
+            missing = np.asarray(key.isna(), dtype=bool)
+            values = key.to_numpy(dtype=key.dtype.numpy_dtype, na_value=0)
+            return values, (missing if missing.any() else None)
+        return key.to_numpy(dtype='float64', na_value=np.nan), None
+    return np.asarray(key), None
+
+
+class TopKRanking:
+    """
+    Rows of df ranked by keys, produced lazily in chunks.
+
+    keys are arrays or Series aligned with df's rows (most significant
+    first); ascending is one flag or one per key. chunk_size=None ranks
+    everything in one full (stable) sort.
+    """
+
+    def __init__(
+        self,
+        df: pd.DataFrame,
+        keys: Sequence,
+        ascending: bool | Sequence[bool] = True,
+        chunk_size: int | None = RANK_CHUNK,
+    ):
+        if isinstance(ascending, bool):
+            ascending = [ascending] * len(keys)
+        self.df = df
+        self.chunk_size = chunk_size
+        coded = []
+        for key, asc in zip(keys, ascending):
+            values, missing = _key_values(key)
+            if missing is not None:
+                # Missing integers rank last: a 1-bit flag ahead of the values
+                coded.append((missing.astype(np.uint64), 1))
+            coded.append(_key_codes(values, asc))
+        n = len(df)
+        self._ranked: list[np.ndarray] = []
+        # Rows still to rank, in position order, per group of equal leading keys (in rank order)
+        self._groups: list[np.ndarray] = []
+        lead = _pack(coded[:-1], n) if sum(width for _, width in coded[:-1]) <= 64 else None
+        if sum(width for _, width in coded) <= 64:
+            self._packed = _pack(coded, n)
+            self._groups = [np.arange(n)]
+        elif lead is not None and len(values := pd.unique(lead)) <= MAX_RANK_GROUPS:
+            self._packed = coded[-1][0]
+            self._groups = [np.flatnonzero(lead == value) for value in np.sort(values)]
+        else:
+            # Too wide to pack: one full lexsort (last key of lexsort is the primary one)
+            self._packed = None
+            self._groups = [np.lexsort([codes for codes, _ in reversed(coded)])]
+
+    def _next_chunk(self, k: int) -> np.ndarray:
+        remaining = self._groups[0]
+        if self._packed is None:
+            self._groups.pop(0)
+            return remaining
+        if k >= len(remaining):
+            self._groups.pop(0)
+            return remaining[np.argsort(self._packed[remaining], kind='stable')]
+        keys = self._packed[remaining]
+        kth = np.partition(keys, k - 1)[k - 1]
+        # Everything below the k-th key, then rows equal to it in position order
+        take = keys < kth
+        ties = np.flatnonzero(keys == kth)
+        take[ties[:k - np.count_nonzero(take)]] = True
+        chunk = remaining[take]
+        self._groups[0] = remaining[~take]
+        return chunk[np.argsort(self._packed[chunk], kind='stable')]
+
+    def chunks(self) -> Iterator[np.ndarray]:
+        """Row positions of df in rank order, chunk by chunk."""
+        k = self.chunk_size or len(self.df)
+        while self._groups:
+            chunk = self._next_chunk(max(k, 1))
+            if len(chunk):
+                self._ranked.append(chunk)
+                yield chunk
+            k *= 2
+
+    def rows(self, *columns: str) -> Iterator[tuple]:
+        """Tuples of the given columns, row by row in rank order."""
+        for chunk in self.chunks():
+            yield from zip(*(self.df[column].take(chunk).tolist() for column in columns))
+
+    def head(self) -> pd.DataFrame:
+        """The rows ranked so far, in rank order."""
+        if not self._ranked:
+            return self.df.iloc[:0]
+        return self.df.take(np.concatenate(self._ranked))
+
+
+def rank_order(keys: Sequence, ascending: bool | Sequence[bool] = True) -> np.ndarray:
+    """Positions of all rows in rank order (same order as TopKRanking, in one sort)."""
+    ranking = TopKRanking(pd.DataFrame(index=pd.RangeIndex(len(keys[0]))), keys, ascending, chunk_size=None)
+    return np.concatenate([np.arange(0), *ranking.chunks()])
+
+
+def neg_eps_score(df: pd.DataFrame) -> pd.Series:
+    """PB * |EPS| / |price| (price from PE * EPS when the export has none; NaN for a zero price)."""
+    if PRICE in df.columns:
+        price = pd.to_numeric(df[PRICE], errors='coerce')
+    else:
+        price = pd.to_numeric(df[PE], errors='coerce') * pd.to_numeric(df['EPS'], errors='coerce')
+    den = price.abs()
+    den = den.mask(den == 0)
+    return pd.to_numeric(df[PB], errors='coerce') * pd.to_numeric(df['EPS'], errors='coerce').abs() / den
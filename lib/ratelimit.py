@@ -0,0 +1,26 @@
+import threading
+import time
+
+
+class HostRateLimiter:
+    """
+    Thread-safe per-host request spacing.
+
+    Each call to wait(host) reserves the next free slot for that host, so
+    concurrent callers are spaced at least min_interval seconds apart instead
+    of all firing at once.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._next_slot: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host: str) -> None:
+        """Block until a request to host is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
@@ -0,0 +1,296 @@
+"""
+Postgres access for the screener: startup snapshot, cached stock info and
+batched write-back of cache updates and deferrals.
+"""
+
+from dataclasses import dataclass, field
+
+from psycopg2.extras import execute_values
+
+from lib.db import connection
+from lib.git_utils import get_run_context
+
+
+@dataclass
+class ScreeningSnapshot:
+    """
+    Everything the screener needs from Postgres at startup, for the symbols
+    and company names of the current universe (see get_screening_snapshot).
+    """
+    # Listings of disqualified / deferred companies or not-tradeable markets
+    excluded_symbols: set[str] = field(default_factory=set)
+    # Disqualified or deferred companies
+    excluded_names: set[str] = field(default_factory=set)
+    # Market abbreviations with not_tradeable_until in the future / past
+    deferred_markets: set[str] = field(default_factory=set)
+    expired_markets: set[str] = field(default_factory=set)
+    # company_name -> had_quarter_loss (companies missing from the DB are absent)
+    quarter_loss: dict[str, bool] = field(default_factory=dict)
+    # company_name -> cached stock info (same shape as get_stock_info_cache)
+    stock_info: dict[str, dict] = field(default_factory=dict)
+    # company_name -> reason code of an expired deferral
+    expired_deferral_reasons: dict[str, str] = field(default_factory=dict)
+
+
+def get_screening_snapshot(symbols: list[str], company_names: list[str]) -> ScreeningSnapshot:
+    """
+    Load exclusions, quarter-loss flags, cached stock info and last exclusion
+    reasons in one round-trip, restricted to the given universe so the cost
+    follows the size of the screener export rather than of the companies table.
+    Missing (NaN / None) names and symbols of the export are ignored.
+    """
+    # Only str values can be bound to the text[] parameters
+    names = [name for name in company_names if isinstance(name, str)]
+    symbols = [symbol for symbol in symbols if isinstance(symbol, str)]
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT 'company' AS kind,
+                   c.company_name AS key,
+                   c.is_disqualified OR COALESCE(c.dont_consider_until > NOW(), FALSE) AS excluded,
+                   c.had_quarter_loss,
+                   c.last_year_loss,
+                   c.first_div_year,
+                   c.last_no_div_year,
+                   c.first_div_year_verified,
+                   c.dividend_data_source,
+                   c.dividend_cache_expires_at,
+                   er.code AS expired_reason
+            FROM companies c
+            LEFT JOIN exclusion_reasons er
+              ON er.id = c.defer_reason_id
+             AND c.is_disqualified = FALSE
+             AND c.dont_consider_until <= NOW()
+            WHERE c.company_name = ANY(%(names)s)
+            UNION ALL
+            SELECT 'symbol', sl.symbol, TRUE,
+                   NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL
+            FROM stock_listings sl
+            JOIN companies c ON sl.company_id = c.id
+            JOIN stock_markets sm ON sl.market_id = sm.id
+            WHERE sl.symbol = ANY(%(symbols)s)
+              AND (c.is_disqualified = TRUE
+                   OR c.dont_consider_until > NOW()
+                   OR sm.not_tradeable_until > NOW())
+            UNION ALL
+            SELECT 'market', abbreviation, not_tradeable_until > NOW(),
+                   NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL
+            FROM stock_markets
+            WHERE not_tradeable_until IS NOT NULL
+        """, {'names': names, 'symbols': symbols})
+        rows = cursor.fetchall()
+
+    snapshot = ScreeningSnapshot()
+    for (kind, key, excluded, quarter_loss, year_loss, first_div_year, last_no_div_year,
+         first_div_verified, div_source, div_expires, expired_reason) in rows:
+        if kind == 'company':
+            if excluded:
+                snapshot.excluded_names.add(key)
+            snapshot.quarter_loss[key] = quarter_loss
+            snapshot.stock_info[key] = {
+                'year_loss': year_loss,   # int or None
+                'first_div_year': first_div_year,
+                'last_no_div_year': last_no_div_year,  # int or None
+                'first_div_year_verified': first_div_verified,  # bool
+                'dividend_data_source': div_source,
+                'dividend_cache_expires_at': div_expires,
+            }
+            if expired_reason is not None:
+                snapshot.expired_deferral_reasons[key] = expired_reason
+        elif kind == 'symbol':
+            snapshot.excluded_symbols.add(key)
+        elif excluded:
+            snapshot.deferred_markets.add(key)
+        else:
+            snapshot.expired_markets.add(key)
+    return snapshot
+
+
+def get_last_exclusion_reasons(
+    snapshot: ScreeningSnapshot, markets: list[str], company_names: list[str]
+) -> dict[str, str]:
+    """Get the last exclusion reason for displayed stocks.
+
+    Checks two sources:
+    - Company-level: expired deferrals (dont_consider_until in the past)
+    - Market-level: expired market restrictions (not_tradeable_until in the past)
+
+    markets: MARKET column values aligned with company_names.
+
+    Returns dict of company_name -> reason code.
+    """
+    result = {
+        name: snapshot.expired_deferral_reasons[name]
+        for name in company_names if name in snapshot.expired_deferral_reasons
+    }
+
+    if snapshot.expired_markets:
+        for market, name in zip(markets, company_names):
+            if name not in result and market in snapshot.expired_markets:
+                result[name] = 'market: ' + market
+
+    return result
+
+
+def get_stock_info_cache(company_names: list[str]) -> dict[str, dict]:
+    """
+    Get cached stock info for companies.
+
+    Returns: year_loss (int or None), first_div_year, last_no_div_year (int or None)
+    Does NOT return: AL_ratio (not cached, always fetch fresh)
+    """
+    if not company_names:
+        return {}
+
+    with connection() as conn, conn.cursor() as cursor:
+        placeholders = ','.join(['%s'] * len(company_names))
+        cursor.execute(f"""
+            SELECT company_name, last_year_loss, first_div_year, last_no_div_year, first_div_year_verified,
+                   dividend_data_source, dividend_cache_expires_at
+            FROM companies
+            WHERE company_name IN ({placeholders})
+        """, company_names)
+        rows = cursor.fetchall()
+
+    result = {}
+    for row in rows:
+        result[row[0]] = {
+            'year_loss': row[1],   # int or None
+            'first_div_year': row[2],
+            'last_no_div_year': row[3],  # int or None
+            'first_div_year_verified': row[4],  # bool
+            'dividend_data_source': row[5],
+            'dividend_cache_expires_at': row[6],
+        }
+    return result
+
+
+# How long each screener deferral keeps a company out (PostgreSQL interval literals)
+DEFERRAL_INTERVALS = {
+    'quote_not_found': '1 month',
+    'al_ratio': '6 months',
+    'cash_debt': '3 months',
+}
+
+
+def _unique_name_rounds(rows: list[tuple]) -> list[list[tuple]]:
+    """
+    Split rows (company_name first) into rounds where each name appears once.
+
+    ON CONFLICT DO UPDATE cannot touch the same row twice in one statement;
+    the n-th occurrence of a name goes to round n, so rounds applied in order
+    reproduce row-by-row semantics.
+    """
+    seen: dict[str, int] = {}
+    rounds: list[list[tuple]] = []
+    for row in rows:
+        n = seen.get(row[0], 0)
+        seen[row[0]] = n + 1
+        if n == len(rounds):
+            rounds.append([])
+        rounds[n].append(row)
+    return rounds
+
+
+def _stock_info_cache_row(company_name: str, stock_info: dict, updated_by: str | None) -> tuple | None:
+    """Row for the stock info upserts, or None if there is nothing to cache."""
+    div_source = stock_info.get('dividend_data_source')
+    year_loss = stock_info.get('year_loss')  # int or None; cache if not None
+    last_no_div_year = stock_info.get('last_no_div_year')  # int or None; cache if not None
+    first_div_year = stock_info.get('first_div_year')
+    if year_loss is None and last_no_div_year is None and first_div_year is None and div_source is None:
+        return None
+    return (company_name, year_loss, last_no_div_year, first_div_year,
+            div_source, stock_info.get('dividend_cache_expires_at'), updated_by)
+
+
+def write_screen_batch(
+    cache_updates: list[tuple[str, dict]],
+    deferrals: list[tuple[str, str]],
+) -> set[tuple[str, str]]:
+    """
+    Write one screener batch in a single transaction.
+
+    cache_updates: (company_name, stock_info) pairs. Caches any non-None int for
+        year_loss and last_no_div_year with GREATEST logic (never downgrade) and
+        first_div_year with COALESCE; does NOT cache AL_ratio (always fetch fresh).
+        When stock_info contains dividend_data_source (irbank | yfinance), the dividend
+        bundle is updated authoritatively: last_no_div_year via COALESCE, plus
+        dividend_data_source and dividend_cache_expires_at (for irbank:
+        lib.dividends.DIVIDEND_IRBANK_TTL after the IRBANK page was fetched or
+        revalidated, the cached page itself being revalidated every 7 days,
+        ENDPOINT_TTLS["irbank"]; NULL for yfinance).
+    deferrals: (company_name, reason_code) pairs; reason_code is a key of
+        DEFERRAL_INTERVALS. Companies are created if missing. A deferral is skipped
+        while the same reason is still active (expired deferrals renew).
+
+    Returns the (company_name, reason_code) deferrals that were applied.
+    """
+    updated_by = get_run_context().updated_by
+    cache_rows = [
+        row for row in (_stock_info_cache_row(name, info, updated_by) for name, info in cache_updates)
+        if row is not None
+    ]
+    deferral_rows = [
+        (name, DEFERRAL_INTERVALS[code], code, updated_by) for name, code in deferrals
+    ]
+    if not cache_rows and not deferral_rows:
+        return set()
+
+    applied = set()
+    with connection() as conn, conn.cursor() as cursor:
+        for batch in _unique_name_rounds(cache_rows):
+            bundle_rows = [row for row in batch if row[4] is not None]
+            plain_rows = [row[:4] + row[6:] for row in batch if row[4] is None]
+            if bundle_rows:
+                execute_values(cursor, """
+                    INSERT INTO companies AS c (
+                        company_name, last_year_loss, last_no_div_year, first_div_year,
+                        dividend_data_source, dividend_cache_expires_at, updated_at, updated_by
+                    )
+                    VALUES %s
+                    ON CONFLICT (company_name) DO UPDATE
+                    SET last_year_loss = GREATEST(c.last_year_loss, EXCLUDED.last_year_loss),
+                        last_no_div_year = COALESCE(EXCLUDED.last_no_div_year, c.last_no_div_year),
+                        first_div_year = COALESCE(EXCLUDED.first_div_year, c.first_div_year),
+                        dividend_data_source = EXCLUDED.dividend_data_source,
+                        dividend_cache_expires_at = EXCLUDED.dividend_cache_expires_at,
+                        updated_at = NOW(),
+                        updated_by = EXCLUDED.updated_by
+                """, bundle_rows, template="(%s, %s, %s, %s, %s, %s, NOW(), %s)")
+            if plain_rows:
+                execute_values(cursor, """
+                    INSERT INTO companies AS c (
+                        company_name, last_year_loss, last_no_div_year, first_div_year, updated_at, updated_by
+                    )
+                    VALUES %s
+                    ON CONFLICT (company_name) DO UPDATE
+                    SET last_year_loss = GREATEST(c.last_year_loss, EXCLUDED.last_year_loss),
+                        last_no_div_year = GREATEST(c.last_no_div_year, EXCLUDED.last_no_div_year),
+                        first_div_year = COALESCE(EXCLUDED.first_div_year, c.first_div_year),
+                        updated_at = NOW(),
+                        updated_by = EXCLUDED.updated_by
+                """, plain_rows, template="(%s, %s, %s, %s, NOW(), %s)")
+
+        for batch in _unique_name_rounds(deferral_rows):
+            codes = {name: code for name, _, code, _ in batch}
+            returned = execute_values(cursor, """
+                INSERT INTO companies AS c (
+                    company_name, dont_consider_until, defer_reason_id, updated_at, updated_by
+                )
+                VALUES %s
+                ON CONFLICT (company_name) DO UPDATE
+                SET dont_consider_until = EXCLUDED.dont_consider_until,
+                    defer_reason_id = EXCLUDED.defer_reason_id,
+                    updated_at = NOW(),
+                    updated_by = EXCLUDED.updated_by
+                WHERE NOT (
+                    COALESCE(c.dont_consider_until > NOW(), FALSE)
+                    AND c.defer_reason_id IS NOT DISTINCT FROM EXCLUDED.defer_reason_id
+                )
+                RETURNING company_name
+            """, batch, template="""(
+                %s, NOW() + %s::interval,
+                (SELECT id FROM exclusion_reasons WHERE code = %s), NOW(), %s
+            )""", fetch=True)
+            applied.update((row[0], codes[row[0]]) for row in returned)
+    return applied
@@ -0,0 +1,634 @@
+"""
+Screening engine behind bin/screen.py.
+
+ScreeningEngine runs the screen as explicit stages:
+
+    load -> exclude -> rank -> (enrich -> filter)* -> recheck -> render
+
+so a long-lived process can run many screens (the response cache, yfinance
+session and DB pool are process-wide and stay warm) and each stage can be
+timed or called on its own.
+"""
+
+import datetime
+import math
+import os
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from dataclasses import dataclass, field
+
+import pandas as pd
+
+from lib.data import SYMBOL, PE_PB, NAME, CURRENT_RATIO, MARKET, EXPORT_DTYPES, get_merged_pd, market_of
+from lib.dividends import _use_pg_dividend_bundle, get_stock_info_batch
+from lib.downloader import COPIED_DOWNLOADS_DIR
+from lib.ingest import read_export
+from lib.metrics import RunMetrics
+from lib.ranking import RANK_CHUNK, TopKRanking
+from lib.screen_db import (
+    ScreeningSnapshot,
+    get_last_exclusion_reasons,
+    get_screening_snapshot,
+    get_stock_info_cache,
+    write_screen_batch,
+)
+
+CURRENT_RATIO_THRESHOLD = 1.5
+AL_RATIO_THRESHOLD = 1.5
+# When True, defer 6 months when AL_ratio < AL_RATIO_THRESHOLD
+AL_RATIO_FILTER_ENABLED = True
+YEAR_LOSS_LOOKBACK = 20
+FIRST_DIV_HISTORY_YEARS = 10
+
+# Fetch stock info iteratively until we have MIN_DISPLAY_COUNT valid stocks
+MIN_DISPLAY_COUNT = 30
+# First batch size; later batches are sized from the observed pass rate
+BATCH_SIZE = 10
+MAX_BATCH_SIZE = 40
+# Pass rate assumed never to drop below this when sizing a batch
+MIN_PASS_RATE = 0.1
+# Symbols fetched concurrently per batch (per-host rate limits still apply)
+FETCH_WORKERS = 4
+
+
+def get_portfolio_symbols_from_csv() -> set[str]:
+    """Get portfolio symbols from portfolio_fin.csv."""
+    filepath = os.path.join(COPIED_DOWNLOADS_DIR, 'portfolio_fin.csv')
+    if os.path.exists(filepath):
+        df = read_export(filepath, EXPORT_DTYPES)
+        return set(df[SYMBOL].dropna())
+    return set()
+
+
+# Display column <- stock info field, with the dtype the column is built as
+ENRICHMENT_COLUMNS = {
+    'first_div_year': ('first_div_year', 'Int16'),
+    'div_gaps': ('last_no_div_year', 'Int16'),
+    'AL_ratio': ('AL_ratio', 'float64'),
+    'year_loss': ('year_loss', 'Int16'),
+    'cash_debt_ok': ('cash_debt_ok', 'boolean'),
+    'current_ratio': ('current_ratio', 'float32'),
+}
+
+
+def names_by_symbol(df: pd.DataFrame) -> pd.Series:
+    """Company name indexed by symbol (first row of a repeated symbol)."""
+    return df.drop_duplicates(SYMBOL).set_index(SYMBOL)[NAME]
+
+
+def enrichment_frame(stock_info: dict[str, dict]) -> pd.DataFrame:
+    """Stock info by symbol as a symbol-indexed frame of ENRICHMENT_COLUMNS, ready to join."""
+    fields = [field for field, _ in ENRICHMENT_COLUMNS.values()]
+    frame = pd.DataFrame(
+        [[info.get(field) for field in fields] for info in stock_info.values()],
+        index=pd.Index(list(stock_info), dtype=str, name=SYMBOL),
+        columns=list(ENRICHMENT_COLUMNS),
+    )
+    return frame.astype({column: dtype for column, (_, dtype) in ENRICHMENT_COLUMNS.items()})
+
+
+class CandidateCursor:
+    """
+    Ranked (symbol, name) candidates handed out in batches.
+
+    Reads the ranking lazily, so a batch costs O(batch) however large the
+    universe is. Each symbol is handed out once (a repeated symbol further
+    down the ranking is skipped).
+    """
+
+    def __init__(self, ranked: Iterable[tuple[str, str]]):
+        self._ranked = iter(ranked)
+        self._seen: set[str] = set()
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        for symbol, name in self._ranked:
+            if symbol not in self._seen:
+                self._seen.add(symbol)
+                yield symbol, name
+
+    def next_batch(self, n: int) -> list[tuple[str, str]]:
+        """Consume and return the next n candidates (fewer at the end, [] when exhausted)."""
+        return list(islice(self, n))
+
+
+@dataclass(frozen=True)
+class ScreeningRules:
+    """
+    Exclusion rules of the screen, usable on partial stock info.
+
+    Every predicate treats a missing (None) value as passing, so the same
+    checks work on cached Postgres rows, on a get_stock_info result that
+    stopped early, and on the complete result.
+    """
+    year_loss_lookback: int = YEAR_LOSS_LOOKBACK
+    first_div_history_years: int = FIRST_DIV_HISTORY_YEARS
+    al_ratio_threshold: float = AL_RATIO_THRESHOLD
+    al_ratio_filter_enabled: bool = AL_RATIO_FILTER_ENABLED
+
+    def _within_lookback(self, year: int | None) -> bool:
+        return year is not None and year > 0 and year >= (datetime.date.today().year - self.year_loss_lookback)
+
+    def recent_loss(self, year_loss: int | None) -> bool:
+        """Net loss within the last year_loss_lookback years."""
+        return self._within_lookback(year_loss)
+
+    def recent_div_gap(self, last_no_div_year: int | None) -> bool:
+        """Year without dividend within the last year_loss_lookback years."""
+        return self._within_lookback(last_no_div_year)
+
+    def short_div_history(self, first_div_year: int | None, verified: bool | None) -> bool:
+        """Manually verified first dividend less than first_div_history_years ago."""
+        return bool(verified) and first_div_year is not None and first_div_year > (
+            datetime.date.today().year - self.first_div_history_years
+        )
+
+    def low_al_ratio(self, al_ratio: float | None) -> bool:
+        return self.al_ratio_filter_enabled and al_ratio is not None and al_ratio < self.al_ratio_threshold
+
+    def rejects(self, info: dict) -> bool:
+        """True once the (possibly partial) stock info fails any rule; stop predicate for get_stock_info."""
+        return (
+            self.recent_loss(info.get('year_loss'))
+            or self.recent_div_gap(info.get('last_no_div_year'))
+            or self.low_al_ratio(info.get('AL_ratio'))
+            or info.get('cash_debt_ok') is False
+        )
+
+    def rejects_cached(self, cached: dict) -> bool:
+        """
+        True when a cached companies row alone already excludes the company,
+        whatever a fresh fetch returns:
+
+        - a recent loss year: last_year_loss is only ever raised (GREATEST) and
+          the final recheck re-reads it from Postgres;
+        - a verified short dividend history: always taken from the cache;
+        - a recent dividend gap, but only when the cached dividend bundle is
+          still usable (get_stock_info then returns it unchanged).
+        """
+        return (
+            self.recent_loss(cached.get('year_loss'))
+            or self.short_div_history(cached.get('first_div_year'), cached.get('first_div_year_verified'))
+            or (_use_pg_dividend_bundle(cached) and self.recent_div_gap(cached.get('last_no_div_year')))
+        )
+
+
+@dataclass
+class ScreenResult:
+    """Outcome of one ScreeningEngine.run(); filled in stage by stage."""
+    display_df: pd.DataFrame | None = None
+    stop_reason: str = "unknown"
+    valid_pre_final: int = 0
+    valid_post_final: int = 0
+    stock_info: dict[str, dict] = field(default_factory=dict)
+    processed_symbols: set[str] = field(default_factory=set)
+    excluded: set[str] = field(default_factory=set)
+    deferred_not_found: list[tuple] = field(default_factory=list)
+    deferred_al_ratio: list[tuple] = field(default_factory=list)
+    deferred_cash_debt: list[tuple] = field(default_factory=list)
+    excluded_loss: list[tuple] = field(default_factory=list)
+    excluded_div_gaps: list[tuple] = field(default_factory=list)
+    excluded_short_div_history: list[tuple] = field(default_factory=list)
+    verified_first_div_names: set[str] = field(default_factory=set)
+    # Wall time per stage in seconds (enrich/filter summed over batches)
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    # Stage timings, upstream latency, cache hit rates and counters for this run
+    metrics: RunMetrics | None = None
+
+    @property
+    def symbols_tried(self) -> int:
+        return len(self.processed_symbols)
+
+
+class ScreeningEngine:
+    """
+    Reusable PE*PB screener.
+
+    Thresholds default to the module constants. The merged PE/PB export is
+    kept between runs and only re-read when the CSV files change. With
+    top_k=False the candidates are fully sorted up front (same order).
+    """
+
+    def __init__(
+        self,
+        pe_file: str | None = None,
+        pb_file: str | None = None,
+        *,
+        current_ratio_threshold: float = CURRENT_RATIO_THRESHOLD,
+        al_ratio_threshold: float = AL_RATIO_THRESHOLD,
+        al_ratio_filter_enabled: bool = AL_RATIO_FILTER_ENABLED,
+        year_loss_lookback: int = YEAR_LOSS_LOOKBACK,
+        first_div_history_years: int = FIRST_DIV_HISTORY_YEARS,
+        min_display_count: int = MIN_DISPLAY_COUNT,
+        batch_size: int = BATCH_SIZE,
+        max_batch_size: int = MAX_BATCH_SIZE,
+        fetch_workers: int = FETCH_WORKERS,
+        prefetch: bool = True,
+        top_k: bool = True,
+    ):
+        self.pe_file = pe_file or os.path.join(COPIED_DOWNLOADS_DIR, 'PE.csv')
+        self.pb_file = pb_file or os.path.join(COPIED_DOWNLOADS_DIR, 'PB.csv')
+        self.current_ratio_threshold = current_ratio_threshold
+        self.al_ratio_threshold = al_ratio_threshold
+        self.al_ratio_filter_enabled = al_ratio_filter_enabled
+        self.year_loss_lookback = year_loss_lookback
+        self.first_div_history_years = first_div_history_years
+        self.min_display_count = min_display_count
+        self.batch_size = batch_size
+        self.max_batch_size = max_batch_size
+        self.fetch_workers = fetch_workers
+        self.prefetch = prefetch
+        self.top_k = top_k
+        self.rules = ScreeningRules(
+            year_loss_lookback=year_loss_lookback,
+            first_div_history_years=first_div_history_years,
+            al_ratio_threshold=al_ratio_threshold,
+            al_ratio_filter_enabled=al_ratio_filter_enabled,
+        )
+        self.snapshot: ScreeningSnapshot | None = None
+        self._merged_df: pd.DataFrame | None = None
+        self._merged_key: tuple | None = None
+
+    # --- stages -------------------------------------------------------------
+
+    def load(self) -> pd.DataFrame:
+        """Merged PE/PB export with the MARKET column (re-read only when the files change)."""
+        key = tuple(os.stat(path).st_mtime_ns for path in (self.pe_file, self.pb_file))
+        if self._merged_df is None or key != self._merged_key:
+            merged_df = get_merged_pd(self.pe_file, self.pb_file)
+            merged_df[MARKET] = market_of(merged_df[SYMBOL]).astype('category')
+            self._merged_df = merged_df
+            self._merged_key = key
+        return self._merged_df
+
+    def exclude(self, merged_df: pd.DataFrame) -> pd.DataFrame:
+        """Drop excluded symbols/companies, deferred markets and low current ratios."""
+        # Exclusions, quarter-loss flags and cached stock info in one round-trip
+        self.snapshot = get_screening_snapshot(merged_df[SYMBOL].tolist(), merged_df[NAME].unique().tolist())
+        excluded_symbols = self.snapshot.excluded_symbols | get_portfolio_symbols_from_csv()
+        excluded_names = self.snapshot.excluded_names
+
+        # Excluded stocks (by symbol OR by company name), deferred markets and low
+        # current ratios in one mask, so only the surviving rows are taken
+        keep = ~merged_df[SYMBOL].isin(excluded_symbols) & ~merged_df[NAME].isin(excluded_names)
+        if self.snapshot.deferred_markets:
+            keep &= ~merged_df[MARKET].isin(self.snapshot.deferred_markets)
+        keep &= (merged_df[CURRENT_RATIO] >= self.current_ratio_threshold) | merged_df[CURRENT_RATIO].isna()
+        return merged_df[keep]
+
+    def rank(self, filtered_df: pd.DataFrame) -> TopKRanking:
+        """
+        Order candidates: quarterly-loss companies last, then ascending PE*PB.
+
+        With top_k the ranking is produced in chunks as candidates are taken,
+        so only the head of the universe is ever sorted.
+        """
+        # quartal_loss: <NA> for unknown, False for checked no loss, True for loss
+        quartal_loss = filtered_df[NAME].map(self.snapshot.quarter_loss).astype('boolean')
+
+        # Sort: True (quarterly loss) at end, False/NA sorted by PE*PB
+        # Sort key: True=1 (end), False/NA=0 (sort by PE*PB)
+        # assign() adds the column without copying the existing ones
+        ranked_df = filtered_df.assign(quartal_loss=quartal_loss)
+        return TopKRanking(
+            ranked_df,
+            [quartal_loss.fillna(False).astype('int8'), ranked_df[PE_PB]],
+            chunk_size=RANK_CHUNK if self.top_k else None,
+        )
+
+    def enrich(
+        self, candidates: list[str], names: dict[str, str], cancel: threading.Event | None = None
+    ) -> tuple[dict[str, dict], list[str], dict[str, dict], set[str]]:
+        """
+        Fetch stock info for one batch and merge in cached Postgres values.
+
+        Candidates the cached row already rejects (ScreeningRules.rejects_cached)
+        are not fetched; their stock info comes from the cache. The rest stop
+        fetching as soon as a rule rejects them.
+
+        Returns (stock_info by symbol, not-found symbols, cache rows by company name,
+        cache-rejected symbols).
+        """
+        # Cached year_loss/div_gaps/dividend bundle from the startup snapshot
+        stock_info_cache = {
+            name: self.snapshot.stock_info[name] for name in names.values() if name in self.snapshot.stock_info
+        }
+
+        cache_rejected = {
+            symbol for symbol in candidates
+            if names[symbol] in stock_info_cache and self.rules.rejects_cached(stock_info_cache[names[symbol]])
+        }
+        to_fetch = [symbol for symbol in candidates if symbol not in cache_rejected]
+
+        # Fetch from yfinance
+        fetched, not_found_symbols = get_stock_info_batch(
+            to_fetch, names=names, pg_dividend_cache=stock_info_cache,
+            max_workers=self.fetch_workers, stop=self.rules.rejects, cancel=cancel,
+        ) if to_fetch else ({}, [])
+
+        stock_info = {}
+        for symbol in candidates:
+            if symbol in cache_rejected:
+                cached = stock_info_cache[names[symbol]]
+                stock_info[symbol] = {
+                    "first_div_year": cached.get('first_div_year'),
+                    "last_no_div_year": cached.get('last_no_div_year'),
+                    "AL_ratio": None,
+                    "year_loss": cached.get('year_loss'),
+                    "current_ratio": None,
+                    "cash_debt_ok": None,
+                }
+            else:
+                stock_info[symbol] = fetched[symbol]
+
+        # Override with cached values (take the more recent known loss year)
+        for symbol in candidates:
+            if symbol in not_found_symbols:
+                continue
+            company_name = names[symbol]
+            if company_name in stock_info_cache:
+                cached = stock_info_cache[company_name]
+                # Do not overwrite dividend bundle or year_loss from a fresh IRBANK/yfinance fetch this run
+                if 'dividend_data_source' not in stock_info[symbol]:
+                    cached_year = cached.get('year_loss')
+                    fresh_year = stock_info[symbol].get('year_loss')
+                    if cached_year is not None and (fresh_year is None or cached_year > fresh_year):
+                        stock_info[symbol]['year_loss'] = cached_year
+                    cached_div = cached.get('last_no_div_year')
+                    fresh_div = stock_info[symbol].get('last_no_div_year')
+                    if cached_div is not None and (fresh_div is None or cached_div > fresh_div):
+                        stock_info[symbol]['last_no_div_year'] = cached_div
+                    if cached.get('first_div_year') is not None:
+                        stock_info[symbol]['first_div_year'] = cached['first_div_year']
+
+        return stock_info, not_found_symbols, stock_info_cache, cache_rejected
+
+    def filter(
+        self,
+        result: ScreenResult,
+        candidates: list[str],
+        names: dict[str, str],
+        stock_info: dict[str, dict],
+        not_found_symbols: list[str],
+        stock_info_cache: dict[str, dict],
+        cache_rejected: set[str] = frozenset(),
+    ) -> None:
+        """
+        Apply the exclusion rules to one enriched batch and write it back to Postgres
+        (cache-rejected symbols carry nothing new and are not written).
+        """
+        # Cache updates and deferrals for this batch, written in one transaction below
+        cache_updates = []
+        deferrals = []  # (symbol, company_name, reason_code, detail)
+
+        # Process not found symbols
+        for symbol in not_found_symbols:
+            deferrals.append((symbol, names[symbol], 'quote_not_found', None))
+            result.excluded.add(symbol)
+
+        rules = self.rules
+        for symbol in candidates:
+            if symbol in not_found_symbols:
+                continue
+
+            info = stock_info.get(symbol, {})
+            company_name = names[symbol]
+
+            # Check AL_ratio
+            al_ratio = info.get('AL_ratio')
+            if rules.low_al_ratio(al_ratio):
+                deferrals.append((symbol, company_name, 'al_ratio', al_ratio))
+                result.excluded.add(symbol)
+
+            # Check year_loss (exclude if loss within last year_loss_lookback years)
+            year_loss = info.get('year_loss')
+            if rules.recent_loss(year_loss):
+                result.excluded_loss.append((symbol, company_name, year_loss))
+                result.excluded.add(symbol)
+
+            # Check cash_debt_ok
+            if info.get('cash_debt_ok') is False:
+                deferrals.append((symbol, company_name, 'cash_debt', None))
+                result.excluded.add(symbol)
+
+            # Check last_no_div_year (exclude if gap within the lookback window)
+            last_no_div = info.get('last_no_div_year')
+            if rules.recent_div_gap(last_no_div):
+                result.excluded_div_gaps.append((symbol, company_name, last_no_div))
+                result.excluded.add(symbol)
+
+            # Check first_div_year (only filter when manually verified)
+            if company_name in stock_info_cache:
+                cached_verified = stock_info_cache[company_name]
+                first_div_cached = cached_verified.get('first_div_year')
+                if rules.short_div_history(first_div_cached, cached_verified.get('first_div_year_verified')):
+                    result.excluded_short_div_history.append((symbol, company_name, first_div_cached))
+                    result.excluded.add(symbol)
+
+            # Cache info
+            if symbol not in cache_rejected:
+                cache_updates.append((company_name, info))
+
+            # Store info for display
+            result.stock_info[symbol] = info
+
+        applied = write_screen_batch(cache_updates, [(name, code) for _, name, code, _ in deferrals])
+        for symbol, company_name, code, detail in deferrals:
+            if (company_name, code) not in applied:
+                continue
+            if code == 'quote_not_found':
+                result.deferred_not_found.append((symbol, company_name))
+            elif code == 'al_ratio':
+                result.deferred_al_ratio.append((symbol, company_name, detail))
+            elif code == 'cash_debt':
+                result.deferred_cash_debt.append((symbol, company_name))
+
+        result.processed_symbols.update(candidates)
+
+    def recheck(self, result: ScreenResult, ranked_df: pd.DataFrame) -> None:
+        """
+        Final check: re-read last_year_loss from DB for survivors and apply the lookback filter
+        (catches cases where batch loop wrote a fresher loss year for a previously-clean symbol).
+        """
+        survivors = list(result.processed_symbols - result.excluded)
+        if not survivors:
+            return
+        survivor_names = names_by_symbol(ranked_df).loc[survivors].to_dict()
+        final_cache = get_stock_info_cache(list(survivor_names.values()))
+        for symbol in survivors:
+            company_name = survivor_names[symbol]
+            cached = final_cache.get(company_name, {})
+            if (
+                self.rules.recent_loss(cached.get('year_loss'))
+                or self.rules.recent_div_gap(cached.get('last_no_div_year'))
+                or self.rules.short_div_history(cached.get('first_div_year'), cached.get('first_div_year_verified'))
+            ):
+                result.excluded.add(symbol)
+        result.verified_first_div_names = {
+            name for name, cached in final_cache.items()
+            if cached.get('first_div_year_verified')
+        }
+
+    def render(self, result: ScreenResult, ranked_df: pd.DataFrame) -> pd.DataFrame:
+        """Display frame: surviving processed symbols with enrichment columns, renamed for printing."""
+        all_stock_info = result.stock_info
+        verified_first_div_names = result.verified_first_div_names
+
+        # Only surviving processed symbols are displayed: take them first, so the
+        # enrichment columns are built for the display rows, not the whole universe
+        display_df = ranked_df[
+            ranked_df[SYMBOL].isin(result.processed_symbols) &
+            ~ranked_df[SYMBOL].isin(result.excluded)
+        ]
+
+        # Enrichment columns in one join against the symbol-indexed stock info (a plain
+        # string index: joining through the categorical would match every category)
+        display_df = display_df.join(enrichment_frame(all_stock_info), on=SYMBOL)
+        verified = display_df[NAME].isin(verified_first_div_names) & display_df['first_div_year'].notna()
+        if verified.any():
+            display_df['first_div_year'] = display_df['first_div_year'].astype(object).where(
+                ~verified, display_df['first_div_year'].astype(str) + '*'
+            )
+
+        # Fallback: fill NaN Current Ratio from yfinance
+        display_df[CURRENT_RATIO] = display_df[CURRENT_RATIO].fillna(display_df.pop('current_ratio'))
+
+        last_reasons = get_last_exclusion_reasons(self.snapshot, display_df[MARKET].tolist(), display_df[NAME].tolist())
+        display_df['last_exclusion'] = display_df[NAME].map(last_reasons)
+
+        display_df = display_df.rename(columns={
+            'P / E': 'PE',
+            'Price / Book Ratio': 'PB',
+            'Current Ratio': 'CR',
+            'AL_ratio': 'AL',
+            'year_loss': 'y_loss',
+            'first_div_year': '1st_div',
+            'cash_debt_ok': 'cash_ok',
+            'last_exclusion': 'last_excl',
+        })
+        return display_df.drop(columns=['quartal_loss', 'EPS', PE_PB, MARKET], errors='ignore')
+
+    def next_batch_size(self, valid_count: int, processed_count: int) -> int:
+        """
+        Candidates to fetch next so that, at the pass rate observed so far,
+        the batch is expected to just reach min_display_count.
+
+        The first batch uses batch_size. Later batches stay between
+        fetch_workers (keep every worker busy) and max_batch_size.
+        """
+        if processed_count == 0:
+            return self.batch_size
+        needed = self.min_display_count - valid_count
+        pass_rate = max(valid_count / processed_count, MIN_PASS_RATE)
+        size = math.ceil(needed / pass_rate)
+        return max(self.fetch_workers, 1, min(size, self.max_batch_size))
+
+    # --- driver -------------------------------------------------------------
+
+    def run(self) -> ScreenResult:
+        """Run all stages once and return the result (stage timings and upstream metrics in result.metrics)."""
+        run_metrics = RunMetrics()
+        with run_metrics.activate():
+            result = self._run(run_metrics)
+        result.metrics = run_metrics
+        result.stage_seconds = dict(run_metrics.stage_seconds)
+        run_metrics.extra.update({
+            "stop": result.stop_reason,
+            "valid_pre_final": result.valid_pre_final,
+            "valid_after_db_recheck": result.valid_post_final,
+            "target": self.min_display_count,
+            "symbols_tried": result.symbols_tried,
+        })
+        return result
+
+    def _run(self, run_metrics: RunMetrics) -> ScreenResult:
+        result = ScreenResult()
+
+        with run_metrics.stage('load'):
+            merged_df = self.load()
+        with run_metrics.stage('exclude'):
+            filtered_df = self.exclude(merged_df)
+        with run_metrics.stage('rank'):
+            ranking = self.rank(filtered_df)
+
+        # Candidates in rank order; each batch is claimed from the cursor when it is started
+        cursor = CandidateCursor(ranking.rows(SYMBOL, NAME))
+
+        # Set when the loop ends: a prefetch still running skips the symbols it has not started
+        cancel = threading.Event()
+
+        def start(executor: ThreadPoolExecutor, batch: list[tuple[str, str]]):
+            candidates = [symbol for symbol, _ in batch]
+            top_names = dict(batch)
+            return candidates, top_names, executor.submit(self.enrich, candidates, top_names, cancel)
+
+        # One background slot: the next batch is fetched while the current one is filtered and written
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='screen-prefetch')
+        try:
+            pending = None
+            batch = cursor.next_batch(self.next_batch_size(0, 0))
+            if batch:
+                pending = start(executor, batch)
+            while True:
+                if pending is None:
+                    result.stop_reason = "no_more_candidates"
+                    break  # No more candidates
+
+                candidates, top_names, future = pending
+                pending = None
+                # With prefetch this is only the time spent waiting on the fetch
+                with run_metrics.stage('enrich'):
+                    stock_info, not_found_symbols, stock_info_cache, cache_rejected = future.result()
+                run_metrics.incr('batches')
+
+                # Speculatively start the next batch unless this one is expected to reach the target
+                valid_count = len(result.processed_symbols - result.excluded)
+                processed_count = len(result.processed_symbols)
+                if self.prefetch and processed_count:
+                    pass_rate = max(valid_count / processed_count, MIN_PASS_RATE)
+                    expected_valid = valid_count + pass_rate * len(candidates)
+                    if expected_valid < self.min_display_count:
+                        next_size = self.next_batch_size(
+                            round(expected_valid), processed_count + len(candidates)
+                        )
+                        next_candidates = cursor.next_batch(next_size)
+                        if next_candidates:
+                            pending = start(executor, next_candidates)
+
+                with run_metrics.stage('filter'):
+                    self.filter(
+                        result, candidates, top_names, stock_info, not_found_symbols, stock_info_cache, cache_rejected
+                    )
+                run_metrics.incr('cache_rejected', len(cache_rejected))
+
+                # Check if we have enough valid stocks
+                valid_count = len(result.processed_symbols - result.excluded)
+                if valid_count >= self.min_display_count:
+                    result.stop_reason = "reached_min_display"
+                    if pending is not None:
+                        run_metrics.incr('prefetch_discarded', len(pending[0]))
+                    break
+
+                if pending is None:
+                    next_candidates = cursor.next_batch(
+                        self.next_batch_size(valid_count, len(result.processed_symbols))
+                    )
+                    if next_candidates:
+                        pending = start(executor, next_candidates)
+        finally:
+            # A discarded prefetch stops after the symbols already in flight; wait for those
+            # so nothing is still fetching (or printing) once run() returns
+            cancel.set()
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        result.valid_pre_final = len(result.processed_symbols - result.excluded)
+        # Every processed symbol is in the ranked head
+        ranked_df = ranking.head()
+        with run_metrics.stage('recheck'):
+            self.recheck(result, ranked_df)
+        result.valid_post_final = len(result.processed_symbols - result.excluded)
+
+        with run_metrics.stage('render'):
+            result.display_df = self.render(result, ranked_df)
+        return result
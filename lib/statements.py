@@ -0,0 +1,53 @@
+"""
+Net income rows from yfinance statements, shared by lib.dividends (year_loss
+while screening) and lib.fundamentals (stored rows and offline recompute).
+"""
+
+import datetime as _dt
+
+import pandas as pd
+
+# Window (years) for dividend gaps and for treating "no loss found" as a clean record
+LOOKBACK_YEARS = 20
+
+
+def _find_net_income_row(df):
+    preferred = ['NetIncome', 'Net Income', 'NetIncomeCommonStockholders', 'NetIncomeContinuousOperations']
+    for r in preferred:
+        if r in df.index:
+            return r
+    for idx in df.index:
+        s = str(idx).lower().replace(' ', '')
+        if 'netincome' in s or 'net income' in s:
+            return idx
+    return None
+
+
+def net_income_series(df) -> pd.Series | None:
+    """Numeric net income row (indexed by period end) of an income statement, or None."""
+    if df is None or df.empty:
+        return None
+    row = _find_net_income_row(df)
+    if row is None:
+        return None
+    return pd.to_numeric(df.loc[row], errors='coerce')
+
+
+def quote_summary_net_income(js: dict) -> list[tuple[int | None, float]]:
+    """(fiscal year or None, net income) per statement in a quoteSummary income response."""
+    rows = []
+    result = js.get('quoteSummary', {}).get('result', [{}])
+    if not result:
+        return rows
+    for module in ['incomeStatementHistory', 'incomeStatementHistoryQuarterly']:
+        mod_data = result[0].get(module, {})
+        for stmt in mod_data.get('incomeStatementHistory', []):
+            ni = stmt.get('netIncome')
+            if isinstance(ni, dict):
+                raw = ni.get('raw')
+                if raw is not None:
+                    end_date = stmt.get('endDate', {})
+                    ts = end_date.get('raw') if isinstance(end_date, dict) else None
+                    year = _dt.datetime.utcfromtimestamp(ts).year if ts is not None else None
+                    rows.append((year, raw))
+    return rows
@@ -0,0 +1,39 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+
+from lib.ranking import TopKRanking, rank_order
+
+
+def _ranked(df: pd.DataFrame, ascending, chunk_size) -> np.ndarray:
+    ranking = TopKRanking(df, [df[column] for column in df.columns], ascending, chunk_size=chunk_size)
+    return np.concatenate([np.arange(0), *ranking.chunks()])
+
+
+def test_int64_keys_above_2_53_rank_exactly():
+    key = pd.Series([2**53 + 1, 2**53, 5], dtype='int64')
+    assert rank_order([key]).tolist() == [2, 1, 0]
+
+
+def test_integer_keys_match_stable_sort_values():
+    rng = np.random.default_rng(0)
+    n = 500
+    big = pd.Series(2**62 + rng.integers(0, 4, n), dtype='int64')
+    nullable = pd.Series(2**60 + rng.integers(0, 4, n), dtype='Int64')
+    nullable[rng.random(n) < 0.2] = pd.NA
+    flag = pd.Series(rng.integers(0, 2, n), dtype='int8')
+    df = pd.DataFrame({'flag': flag, 'big': big, 'nullable': nullable})
+    for columns, ascending in (
+        (['big'], [True]),
+        (['big'], [False]),
+        (['nullable'], [False]),
+        (['flag', 'big'], [True, False]),
+        (['flag', 'nullable', 'big'], [False, True, True]),
+    ):
+        expected = df[columns].sort_values(columns, ascending=ascending, kind='stable').index.to_numpy()
+        for chunk_size in (None, 1, 7, 64):
+            assert np.array_equal(_ranked(df[columns], ascending, chunk_size), expected), (columns, chunk_size)